@@ -0,0 +1,396 @@
+import struct
+
+from . import hydata
+from . import hymisc
+
+"""Compact binary format for HydraRecords.
+
+A record is a short header (magic, format version, Hydra version) followed by
+the record's fields in a fixed order, so no keys or type names are stored.
+
+Integers are varints (zigzag for signed values), chords use their hyencode
+chord codes, and enums are single bytes.
+
+Paths tend to repeat the same activations and backends (ties, variants,
+calibration sweeps), so those are written once to per-record tables, and
+paths and activations refer to them by index. Tables are sorted by time, and
+each entry's ticks are a delta from the previous entry's.
+
+hydata.json_save / json_load remain the readable export format.
+
+"""
+MAGIC = b'HYR'
+FORMAT_VERSION = 2
+# Older versions whose header (up to the paths) is laid out the same, so
+# their options can still be read. Their paths can't: version 1 was written
+# with two different layouts.
+HEADER_VERSIONS = (1,)
+
+DEPTH_MODES = [None, 'scores', 'points']
+
+# Tags for numbers that can be None, an int or a float
+NUM_NONE = 0
+NUM_INT = 1
+NUM_FLOAT = 2
+
+SQ_IN = 0
+SQ_OUT = 1
+
+_DOUBLE = struct.Struct('<d')
+
+
+def dumps(record):
+    """HydraRecord --> bytes."""
+    w = RecordWriter()
+    w.record(record)
+    return bytes(w.buffer)
+
+def dump(record, fp):
+    fp.write(dumps(record))
+
+def loads(data):
+    """bytes --> HydraRecord."""
+    r = RecordReader(data)
+    record = r.record_header()
+    if record.is_version_compatible():
+        record._paths = list(r.paths())
+    return record
+
+def load(fp):
+    """Read a HydraRecord from a binary file object."""
+    return loads(fp.read())
+
+def loads_header(data):
+    """bytes --> HydraRecord without its paths (for its version and options)."""
+    return RecordReader(data).record_header()
+
+def iter_paths(data):
+    """Decode a record's paths one at a time (best first), without decoding
+    the rest of the record. Nothing is generated for outdated records."""
+    r = RecordReader(data)
+    if r.record_header().is_version_compatible():
+        yield from r.paths()
+
+def is_record_data(data):
+    return data[:len(MAGIC)] == MAGIC
+
+
+class RecordWriter:
+    
+    def __init__(self):
+        self.buffer = bytearray()
+        # Table index of every activation and backend, by id
+        self._indexes = {}
+    
+    def uint(self, n):
+        while n > 0x7f:
+            self.buffer.append((n & 0x7f) | 0x80)
+            n >>= 7
+        self.buffer.append(n)
+    
+    def int(self, n):
+        self.uint(n << 1 if n >= 0 else (-n << 1) - 1)
+    
+    def num(self, n):
+        if n is None:
+            self.buffer.append(NUM_NONE)
+        elif isinstance(n, int):
+            self.buffer.append(NUM_INT)
+            self.int(n)
+        else:
+            self.buffer.append(NUM_FLOAT)
+            self.buffer += _DOUBLE.pack(n)
+    
+    def bool(self, b):
+        self.buffer.append(1 if b else 0)
+    
+    def chord(self, chord):
+        code = chord.code().encode('ascii')
+        self.buffer.append(len(code))
+        self.buffer += code
+    
+    def record(self, record):
+        self.buffer += MAGIC
+        self.buffer.append(FORMAT_VERSION)
+        self.uint(len(record.hyversion))
+        for n in record.hyversion:
+            self.uint(n)
+        
+        self.num(record.ms_limit)
+        self.bool(record.ms_frontier)
+        self.buffer.append(DEPTH_MODES.index(record.depth_mode))
+        self.num(record.depth_value)
+        self.bool(record.e_sweep)
+        if record.e_sweep:
+            self.num(record.e_sweep[0])
+            self.num(record.e_sweep[1])
+        self.num(record.approx_gap)
+        
+        # Backends first, since activation entries refer to them
+        activations = list(_activations(record._paths))
+        for objs, entry in [
+            ([bsq for act in activations for bsq in act.backends], self.backend_entry),
+            (activations, self.activation_entry)
+        ]:
+            table = self._table(objs, entry)
+            self.uint(len(table))
+            prev_ticks = 0
+            for ticks, data in table:
+                self.uint(ticks - prev_ticks)
+                self.buffer += data
+                prev_ticks = ticks
+        
+        self.uint(len(record._paths))
+        for path in record._paths:
+            self.path(path)
+    
+    def path(self, path):
+        self.uint(len(path.multsqueezes))
+        for msq in path.multsqueezes:
+            self.chord(msq.chord)
+            self.uint(msq.combo)
+        
+        self.uint(len(path._activations))
+        for act in path._activations:
+            self.uint(self._indexes[id(act)])
+        
+        for score in [
+            path.score_base, path.score_combo, path.score_sp,
+            path.score_solo, path.score_accents, path.score_ghosts
+        ]:
+            self.int(score)
+        self.uint(path.notecount)
+        self.num(path.leftover_sp)
+        self.int(path.skipped_ghosts)
+        self.int(path.skipped_accents)
+        
+        # 0 for base paths
+        self.uint(0 if path.var_point is None else path.var_point + 1)
+        self.uint(len(path.variants))
+        for v in path.variants:
+            self.path(v)
+    
+    def _table(self, objs, entry):
+        """Sorted table of the objects' (ticks, entry data), without repeats.
+        Each object's index is noted for writing the ones that refer to it."""
+        entries = {}
+        for obj in objs:
+            if id(obj) not in entries:
+                entries[id(obj)] = entry(obj)
+        table = sorted(set(entries.values()))
+        indexes = {e: i for i, e in enumerate(table)}
+        for key, e in entries.items():
+            self._indexes[key] = indexes[e]
+        return table
+    
+    def backend_entry(self, bsq):
+        w = RecordWriter()
+        w.chord(bsq.chord)
+        w.int(bsq.points)
+        w.int(bsq.sqout_points)
+        w.bool(bsq.is_sp)
+        w.num(bsq.offset_ms)
+        return (_ticks(bsq.timecode), bytes(w.buffer))
+    
+    def activation_entry(self, act):
+        w = RecordWriter()
+        w.uint(act.skips)
+        w.chord(act.chord)
+        w.num(act.sp_meter)
+        w.num(act.frontend_points)
+        
+        w.uint(len(act.backends))
+        for bsq in act.backends:
+            w.uint(self._indexes[id(bsq)])
+        
+        w.uint(len(act.sqinouts))
+        for sq in act.sqinouts:
+            w.buffer.append(SQ_IN if isinstance(sq, hydata.SqIn) else SQ_OUT)
+            w.num(sq.offset)
+        
+        w.num(act.e_offset)
+        w.uint(len(act.fill_e_offsets))
+        for e in act.fill_e_offsets:
+            w.num(e)
+        return (_ticks(act.timecode), bytes(w.buffer))
+
+
+class RecordReader:
+    """Decodes record data as it goes. Timecodes are left as ticks, like
+    hydata.json_load.
+    
+    Table entries are decoded once, so paths share their Activations (and
+    activations their BackendSqueezes) just like they're written.
+    """
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self._chords = {}
+        self.backends = []
+        self.activations = []
+    
+    def read(self, count):
+        if self.pos + count > len(self.data):
+            raise hymisc.RecordFormatError("Unexpected end of record data")
+        self.pos += count
+        return self.data[self.pos - count:self.pos]
+    
+    def byte(self):
+        try:
+            b = self.data[self.pos]
+        except IndexError:
+            raise hymisc.RecordFormatError("Unexpected end of record data")
+        self.pos += 1
+        return b
+    
+    def uint(self):
+        data = self.data
+        pos = self.pos
+        n = 0
+        shift = 0
+        try:
+            while True:
+                b = data[pos]
+                pos += 1
+                n |= (b & 0x7f) << shift
+                if b < 0x80:
+                    self.pos = pos
+                    return n
+                shift += 7
+        except IndexError:
+            raise hymisc.RecordFormatError("Unexpected end of record data")
+    
+    def int(self):
+        n = self.uint()
+        return n >> 1 if not n & 1 else -((n + 1) >> 1)
+    
+    def num(self):
+        tag = self.byte()
+        if tag == NUM_NONE:
+            return None
+        if tag == NUM_INT:
+            return self.int()
+        if tag == NUM_FLOAT:
+            return _DOUBLE.unpack(self.read(_DOUBLE.size))[0]
+        raise hymisc.RecordFormatError(f"Invalid number tag: {tag}")
+    
+    def bool(self):
+        return self.byte() != 0
+    
+    def chord(self):
+        code = bytes(self.read(self.byte())).decode('ascii')
+        # Chords aren't modified, so one object per code is enough
+        if code not in self._chords:
+            self._chords[code] = hydata.Chord.from_code(code)
+        return self._chords[code]
+    
+    def record_header(self):
+        """Reads up to the record's paths. Records from another format
+        version only come with their Hydra version (and need re-analysis),
+        plus their options if it's one of HEADER_VERSIONS.
+        
+        Records from another Hydra version still have their options (so
+        they can be analyzed again with them), but their paths aren't read.
+        """
+        if bytes(self.read(len(MAGIC))) != MAGIC:
+            raise hymisc.RecordFormatError("Not record data")
+        format_version = self.byte()
+        
+        record = hydata.HydraRecord()
+        record.hyversion = tuple(self.uint() for i in range(self.uint()))
+        
+        if format_version != FORMAT_VERSION:
+            if record.is_version_compatible():
+                raise hymisc.RecordFormatError(f"Unsupported record format version: {format_version}")
+            if format_version not in HEADER_VERSIONS:
+                return record
+        
+        record.ms_limit = self.num()
+        record.ms_frontier = self.bool()
+        record.depth_mode = DEPTH_MODES[self.byte()]
+        record.depth_value = self.num()
+        if self.bool():
+            record.e_sweep = (self.num(), self.num())
+        record.approx_gap = self.num()
+        return record
+    
+    def paths(self):
+        self.backends = self.table(self.backend)
+        self.activations = self.table(self.activation)
+        for i in range(self.uint()):
+            path = self.path()
+            path.prepare_variants()
+            yield path
+    
+    def table(self, entry):
+        items = []
+        ticks = 0
+        for i in range(self.uint()):
+            ticks += self.uint()
+            items.append(entry(ticks))
+        return items
+    
+    def path(self):
+        p = hydata.Path()
+        for i in range(self.uint()):
+            p.multsqueezes.append(hydata.MultSqueeze(self.chord(), self.uint()))
+        
+        activations = self.activations
+        try:
+            p._activations = [activations[self.uint()] for i in range(self.uint())]
+        except IndexError:
+            raise hymisc.RecordFormatError("Invalid activation index")
+        
+        p.score_base = self.int()
+        p.score_combo = self.int()
+        p.score_sp = self.int()
+        p.score_solo = self.int()
+        p.score_accents = self.int()
+        p.score_ghosts = self.int()
+        p.notecount = self.uint()
+        p.leftover_sp = self.num()
+        p.skipped_ghosts = self.int()
+        p.skipped_accents = self.int()
+        
+        var_point = self.uint()
+        p.var_point = None if var_point == 0 else var_point - 1
+        p.variants = [self.path() for i in range(self.uint())]
+        return p
+    
+    def backend(self, ticks):
+        bsq = hydata.BackendSqueeze(ticks, self.chord(), self.int(), self.int(), self.bool())
+        bsq.offset_ms = self.num()
+        return bsq
+    
+    def activation(self, ticks):
+        act = hydata.Activation()
+        act.skips = self.uint()
+        act.timecode = ticks
+        act.chord = self.chord()
+        act.sp_meter = self.num()
+        act.frontend_points = self.num()
+        
+        backends = self.backends
+        try:
+            act.backends = [backends[self.uint()] for i in range(self.uint())]
+        except IndexError:
+            raise hymisc.RecordFormatError("Invalid backend index")
+        
+        for i in range(self.uint()):
+            kind = self.byte()
+            act.sqinouts.append((hydata.SqIn if kind == SQ_IN else hydata.SqOut)(self.num()))
+        
+        act.e_offset = self.num()
+        act.fill_e_offsets = [self.num() for i in range(self.uint())]
+        return act
+
+
+def _activations(paths):
+    """Every activation in the paths, including their variants."""
+    for path in paths:
+        yield from path._activations
+        yield from _activations(path.variants)
+
+def _ticks(timecode):
+    """Records straight from analysis have Timecodes; loaded ones have ticks."""
+    return timecode if isinstance(timecode, int) else timecode.ticks
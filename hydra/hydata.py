@@ -1,5 +1,7 @@
 import json
 import re
+import math
+import copy
 from enum import Enum
 from abc import ABC, abstractmethod
 
@@ -14,6 +16,10 @@ def json_save(obj):
             
             'hyversion': obj.hyversion,
             'ms': obj.ms_limit,
+            'ms_frontier': obj.ms_frontier,
+            'depth': [obj.depth_mode, obj.depth_value],
+            'e_sweep': obj.e_sweep,
+            'approx_gap': obj.approx_gap,
             'paths': obj._paths,
         }
     
@@ -66,6 +72,7 @@ def json_save(obj):
             'sqinouts': obj.sqinouts,
             
             'e_offset': obj.e_offset,
+            'fill_e': obj.fill_e_offsets,
         }
     
     if isinstance(obj, FrontendSqueeze):
@@ -130,6 +137,10 @@ def json_load(_dict):
             return o
         
         o.ms_limit = _dict['ms']
+        o.ms_frontier = _dict.get('ms_frontier', False)
+        o.depth_mode, o.depth_value = _dict.get('depth', (None, None))
+        o.e_sweep = tuple(e_sweep) if (e_sweep := _dict.get('e_sweep')) else None
+        o.approx_gap = _dict.get('approx_gap')
         o._paths = _dict['paths']
         
         for p in o._paths:
@@ -179,6 +190,7 @@ def json_load(_dict):
             o.sqinouts = _dict['sqinouts']
             
             o.e_offset = _dict['e_offset']
+            o.fill_e_offsets = _dict.get('fill_e', [o.e_offset])
         
             return o
         
@@ -231,6 +243,20 @@ class HydraRecord:
         
         self.ms_limit = None
         
+        # Made with an ms frontier instead of a single ms limit: any ms limit
+        # can be viewed, using the same depth settings the analysis used.
+        self.ms_frontier = False
+        self.depth_mode = None
+        self.depth_value = None
+        
+        # Range of calibration offsets (ms) that analysis covered, if any.
+        # Paths for any calibration in this range can be viewed.
+        self.e_sweep = None
+        
+        # Set when analysis ran out of budget and fell back to beam search.
+        # Upper bound on how many points the optimal path could be missing.
+        self.approx_gap = None
+        
         # Path results. Contains nested paths due to the variant system.
         self._paths = []
 
@@ -240,17 +266,86 @@ class HydraRecord:
     
     def is_version_compatible(self):
         return self.hyversion == hymisc.HYDRA_VERSION
+    
+    def is_approximate(self):
+        return self.approx_gap is not None
+    
+    def calibration_range(self):
+        return self.e_sweep if self.e_sweep else (0, 0)
 
     def best_path(self):
         return self._paths[0]
+    
+    def own_calibration(self):
+        """The calibration this record was made for: 0, or the closest one
+        in its calibration range."""
+        low, high = self.calibration_range()
+        return min(max(0, low), high)
+    
+    def best_view_path(self):
+        """The best path as it's shown at the record's own calibration, or
+        None if no path is possible with it."""
+        return next(self.view_paths(None, self.own_calibration()), None)
         
     def all_paths(self):
         """Generates all paths with tree traversal (so it visits all variants)."""
-        pathstovisit = [p for p in self._paths]
+        pathstovisit = self._paths[::-1]
         while pathstovisit:
-            p = pathstovisit.pop(0)
-            pathstovisit = p.variants + pathstovisit
+            p = pathstovisit.pop()
+            pathstovisit.extend(reversed(p.variants))
             yield p
+    
+    def view_paths(self, ms_limit, calibration=0):
+        """Generates the paths to show for the given ms limit (or None).
+        
+        Records made with a single ms limit just show all of their paths.
+        
+        Frontier records pick out what analysis with that ms limit would have
+        kept: the optimal path(s) no matter what, and then paths within the
+        limit down to the record's depth.
+        
+        Records made with an e_sweep can be viewed at any calibration in
+        their calibration range: paths are shown as they play out with that
+        calibration, and paths that aren't possible with it are left out (so
+        there can be none at all).
+        """
+        low, high = self.calibration_range()
+        if not low <= calibration <= high:
+            raise ValueError(f"Calibration {calibration} ms is outside of this record's range ({low} to {high} ms)")
+        
+        if self.e_sweep:
+            paths = [v for p in self.all_paths() if (v := p.at_calibration(calibration)) is not None]
+        else:
+            paths = list(self.all_paths())
+        
+        if not paths:
+            return
+        
+        if not self.ms_frontier:
+            yield from paths
+            return
+        
+        def passes(p):
+            return ms_limit is None or p.passes_ms_filter(ms_limit)
+        
+        best_score = max((p.totalscore() for p in paths), default=None)
+        passing_scores = sorted(
+            set(p.totalscore() for p in paths if passes(p)),
+            reverse=True
+        )
+        
+        for p in paths:
+            score = p.totalscore()
+            if score == best_score:
+                yield p
+            elif not passes(p):
+                continue
+            elif self.depth_mode == 'points':
+                if passing_scores[0] - score <= self.depth_value:
+                    yield p
+            elif self.depth_mode == 'scores':
+                if passing_scores.index(score) <= self.depth_value:
+                    yield p
             
 
 class Path:
@@ -283,9 +378,11 @@ class Path:
         self.variants = []
         
         self.var_point = None        
-        # Activations that can just be copied from this variant's base path.
+        # The path this variant converges with. Activations from var_point
+        # onwards are read from the base path instead of being copied.
         # Not saved/loaded.
-        self._variant_tail = []
+        self._base = None
+        self._tail_length = 0
    
     def __eq__(self, other):
         for listattr in ['multsqueezes', 'activations']:
@@ -310,31 +407,55 @@ class Path:
         return self.pathstring()
         
     def __len__(self):
-        return len(list(self.all_activations()))
+        return len(self._activations) + self._tail_length
         
     def has_activations(self):
         return len(self) != 0
         
     def all_activations(self):
-        for act in self._activations:
-            yield act
-        for act in self._variant_tail:
-            yield act
+        return self._activations_from(0)
+    
+    def _activations_from(self, start):
+        for i in range(start, len(self._activations)):
+            yield self._activations[i]
+        if self._base:
+            yield from self._base._activations_from(self.var_point + max(0, start - len(self._activations)))
     
     def get_activation(self, i):
-        return list(self.all_activations())[i]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("Activation index out of range")
+        
+        path = self
+        while i >= len(path._activations):
+            i = path.var_point + i - len(path._activations)
+            path = path._base
+        return path._activations[i]
         
     def is_variant(self):
         return self.var_point is not None
         
     def prepare_variants(self):
-        """Recursive preparation of variants (copying the shared info from the
-        base path to its variants)."""
-        for v in self.variants:
-            v._variant_tail = list(self.all_activations())[v.var_point:]
-            for attr in ['score_base', 'score_combo', 'score_sp', 'score_solo', 'score_accents', 'score_ghosts', 'notecount', 'leftover_sp']:
-                setattr(v, attr, getattr(self, attr))
-            v.prepare_variants()
+        """Link every variant under this path to the base path it converges
+        with, which shares the base path's activations and score.
+        
+        Variants can be shared between paths during analysis, so each path
+        links its own shallow copies of them.
+        """
+        bases = [self]
+        while bases:
+            base = bases.pop()
+            base.variants = [v._linked_to(base) for v in base.variants]
+            bases.extend(base.variants)
+    
+    def _linked_to(self, base):
+        v = copy.copy(self)
+        v._base = base
+        v._tail_length = len(base) - self.var_point
+        for attr in ['score_base', 'score_combo', 'score_sp', 'score_solo', 'score_accents', 'score_ghosts', 'notecount', 'leftover_sp']:
+            setattr(v, attr, getattr(base, attr))
+        return v
     
     def totalscore(self):
         return (
@@ -378,7 +499,8 @@ class Path:
         c.skipped_ghosts = self.skipped_ghosts
         c.skipped_accents = self.skipped_accents
         
-        c.variants = [v.copy() for v in self.variants]
+        # Variants don't change once they've converged, so they're shared
+        c.variants = [v for v in self.variants]
         c.var_point = self.var_point
         
         return c
@@ -394,6 +516,33 @@ class Path:
     
     def passes_ms_filter(self, ms_filter):
         return (d := self.difficulty()) is None or d < ms_filter
+    
+    def min_calibration(self):
+        """The lowest calibration offset (ms) where this path is possible."""
+        return max((act.min_calibration() for act in self.all_activations()), default=-math.inf)
+    
+    def at_calibration(self, calibration):
+        """This path as it plays out with the given calibration offset, or
+        None if it isn't possible with that calibration."""
+        activations = [act.at_calibration(calibration) for act in self.all_activations()]
+        if any(act is None for act in activations):
+            return None
+        
+        view = self.copy()
+        view._activations = activations
+        view.variants = []
+        return view
+    
+    def difficulty_range(self, low, high):
+        """Bounds on this path's difficulty across a range of calibrations,
+        as (easiest, hardest). No timing requirements counts as -inf."""
+        easiest = -math.inf
+        hardest = -math.inf
+        for act in self.all_activations():
+            act_easiest, act_hardest = act.difficulty_range(low, high)
+            easiest = max(easiest, act_easiest)
+            hardest = max(hardest, act_hardest)
+        return (easiest, hardest)
 
 class Activation:
     
@@ -409,6 +558,10 @@ class Activation:
         self.sqinouts = []
         
         self.e_offset = None
+        
+        # E offsets of the fills that were skipped for this activation and of
+        # this activation's own fill, before any calibration.
+        self.fill_e_offsets = []
     
     def __eq__(self, other):
         for listattr in ['backends', 'sqinouts']:
@@ -453,8 +606,50 @@ class Activation:
         c.sqinouts = [s for s in self.sqinouts]
         
         c.e_offset = self.e_offset
+        c.fill_e_offsets = self.fill_e_offsets
         
         return c
+    
+    def min_calibration(self):
+        """The lowest calibration offset (ms) where this activation's fill
+        can show up."""
+        return -70 - self.fill_e_offsets[-1]
+    
+    def at_calibration(self, calibration):
+        """This activation with the given calibration offset: fills that
+        can't show up aren't counted as skips. None if this activation's own
+        fill can't show up."""
+        shown = [e + calibration for e in self.fill_e_offsets if e + calibration >= -70]
+        if not shown or self.fill_e_offsets[-1] + calibration < -70:
+            return None
+        
+        c = self.copy()
+        c.skips = len(shown) - 1
+        c.e_offset = shown[0]
+        return c
+    
+    def difficulty_range(self, low, high):
+        """Bounds on this activation's difficulty for calibrations from low
+        to high, as (easiest, hardest). No timing requirements counts as -inf.
+        
+        The difficulty only changes at calibrations where a fill starts to show
+        up or stops being E critical, and is linear in between, so checking
+        those points (and just before them) covers everything.
+        """
+        checkpoints = {low, high}
+        for e in self.fill_e_offsets:
+            for c in [-70 - e, 70 - e]:
+                if low < c <= high:
+                    checkpoints.update([c, c - 0.001])
+        
+        diffs = []
+        for c in checkpoints:
+            if act := self.at_calibration(c):
+                d = act.difficulty()
+                diffs.append(-math.inf if d is None else d)
+        if not diffs:
+            return (-math.inf, -math.inf)
+        return (min(diffs), max(diffs))
 
     def e_difficulty(self):
         if self.is_E0():
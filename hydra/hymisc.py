@@ -1,6 +1,7 @@
 from functools import total_ordering
 import pathlib
 import sys
+import threading
 
 """Sort-of semantic version number for Hydra.
     
@@ -12,7 +13,7 @@ For sanity reasons, records with a version that doesn't match completely
 will not be supported and the app will just ask the user to re-analyze them.
 
 """
-HYDRA_VERSION = (1,2,0)
+HYDRA_VERSION = (1,3,0)
 
 
 """Feature flags"""
@@ -48,10 +49,48 @@ TABLE_COL_INFO = {
     'folder': (5, "Folder"),
 }
 
+"""Extra db columns (after the ones above) so rescans can tell what changed."""
+TABLE_STAT_COLS = ['chart_size', 'chart_mtime_ns', 'ini_size', 'ini_mtime_ns']
+
 
 class ChartFileError(Exception):
     """Just a custom error for a chart file that doesn't work."""
     pass
+
+
+class AnalysisCancelled(Exception):
+    """Analysis was stopped partway through via its CancelToken."""
+    pass
+
+
+class RecordFormatError(Exception):
+    """Saved record data that can't be read."""
+    pass
+
+
+class CancelToken:
+    """Lets something else (UI, a job timeout) stop an analysis in progress.
+    
+    Analysis checks the token between units of work, so cancelling is
+    cooperative: the analysis stops at its next check by raising
+    AnalysisCancelled.
+    
+    Any Event-like object works as the underlying flag, e.g. a
+    multiprocessing Event when the analysis is in another process.
+    
+    """
+    def __init__(self, event=None):
+        self._event = event if event is not None else threading.Event()
+    
+    def cancel(self):
+        self._event.set()
+    
+    def is_cancelled(self):
+        return self._event.is_set()
+    
+    def check(self):
+        if self._event.is_set():
+            raise AnalysisCancelled()
     
 
 @total_ordering
@@ -2,13 +2,18 @@ import shutil
 import copy
 import math
 import json
+import time
+import concurrent.futures
+import multiprocessing
 from enum import Enum
-from itertools import combinations
 
 from . import hydata
 from . import hymisc
 
 
+# Frontier size where comparing paths gets split up across worker processes
+PARALLEL_MIN_PATHS = 1000
+
 class ScoreGraph:
     """Description of a song in terms of pathing choices and outcomes.
     
@@ -32,8 +37,10 @@ class ScoreGraph:
     all the info needed to go from start to finish while tracking sp, in
     order to explore valid paths through the song.
     
+    An optional CancelToken is checked once per song timestamp.
+    
     """
-    def __init__(self, song):
+    def __init__(self, song, cancel=None):
         # Finished state
         self.song = song
         self.start = ScoreGraphNode(song.start_time(), False)
@@ -43,14 +50,19 @@ class ScoreGraph:
         self._head_time = None
         self._base_track_head = self.start
         self._sp_track_head = ScoreGraphNode(song.start_time(), True)
+        self.sp_start = self._sp_track_head
         self._combo = 0
         self._pending_deacts = set([])
         self._recent_deact_edges = []       # Used for SqIn backend detection (notes after deacts are usually Out, but recent deacts can make it a SqIn)
         self._recent_backends = []          # Used for SqOut detection (notes before deacts are usually In, but recent notes can be SqOut)
         self._proto_base_edge = ScoreGraphEdge()
         self._proto_sp_edge = ScoreGraphEdge()
+        self._edge_points = []              # (timecode, base points, sp points) per advance, for remaining_points
         
         for timestamp in song._sequence:
+            if cancel:
+                cancel.check()
+            
             # SP can fall off between timestamps, so handle those first if any.
             for pending_deact in sorted(list(self._pending_deacts)):
                 if pending_deact >= timestamp.timecode:
@@ -113,6 +125,91 @@ class ScoreGraph:
                 self.handle_deact(timestamp.timecode, timestamp.chord)
             
         self.advance_tracks(song.last.timecode, song.last.chord)
+        
+        self._init_remaining_points()
+    
+    def _init_remaining_points(self):
+        """Tally the points left in the song after each node's time.
+        
+        Base points are what every path gets no matter what. SP points are
+        the most that SP could possibly add on top of that, which includes
+        the chord on the node itself in case it's a frontend or backend.
+        
+        """
+        self._remaining_base = {}
+        self._remaining_sp = {}
+        
+        base_total = 0
+        sp_total = 0
+        for timecode, base_points, sp_points in reversed(self._edge_points):
+            sp_total += sp_points
+            self._remaining_base[timecode] = base_total
+            self._remaining_sp[timecode] = sp_total
+            base_total += base_points
+        
+        self._remaining_base[self.start.timecode] = base_total
+        self._remaining_sp[self.start.timecode] = sp_total
+    
+    def remaining_points(self, timecode, with_sp=False):
+        """Points still to come after the given node time.
+        
+        Without SP this is a guaranteed amount for any path at that time.
+        With SP this is an upper bound for any path at that time.
+        
+        """
+        if timecode is None:
+            return 0
+        
+        points = self._remaining_base[timecode]
+        if with_sp:
+            points += self._remaining_sp[timecode]
+        return points
+    
+    def nodes(self):
+        """Every node on the normal track, then every node on the SP track."""
+        for node in [self.start, self.sp_start]:
+            while node is not None:
+                yield node
+                node = node.adv_edge.dest if node.adv_edge else None
+    
+    def node_count(self):
+        return sum(1 for node in self.nodes())
+    
+    def edge_count(self):
+        return sum(
+            (node.adv_edge is not None) + (node.branch_edge is not None)
+            for node in self.nodes()
+        )
+    
+    def shares_structure(self, other):
+        """Whether another graph has the same nodes, SP phrases, fills and
+        squeeze timings as this one, so that any path runs through both graphs
+        the exact same way and only the points differ.
+        
+        This is usually the case between chartmodes of the same difficulty
+        (pro/non-pro, and often 1x/2x bass).
+        
+        """
+        for node, other_node in [(self.start, other.start), (self.sp_start, other.sp_start)]:
+            while node is not None or other_node is not None:
+                if node is None or other_node is None:
+                    return False
+                if node.timecode != other_node.timecode:
+                    return False
+                
+                for edge, other_edge in [
+                    (node.adv_edge, other_node.adv_edge),
+                    (node.branch_edge, other_node.branch_edge)
+                ]:
+                    if (edge is None) != (other_edge is None):
+                        return False
+                    if edge is not None and not edge.shares_structure(other_edge):
+                        return False
+                
+                node = node.adv_edge.dest if node.adv_edge else None
+                other_node = other_node.adv_edge.dest if other_node.adv_edge else None
+                
+        return True
     
     def store_notecount(self, count):
         self._proto_base_edge.notecount += count
@@ -195,6 +292,14 @@ class ScoreGraph:
         
         self.length += 1
         
+        base_edge = self._proto_base_edge
+        self._edge_points.append((
+            timecode,
+            base_edge.basescore + base_edge.comboscore + base_edge.soloscore
+            + base_edge.accentscore + base_edge.ghostscore,
+            self._proto_sp_edge.spscore
+        ))
+        
         self._proto_base_edge.dest = ScoreGraphNode(timecode, False)
         self._proto_sp_edge.dest = ScoreGraphNode(timecode, True)
         self._proto_base_edge.dest.chord = chord
@@ -335,6 +440,7 @@ class ScoreGraphEdge:
         
         # SP must become ready by this time in order for the fill to show.
         self.activation_fill_deadline_ms = None
+        self.activation_initial_end_times = None
         
         self.sqinout_time = None
         self.sqinout_timing = None
@@ -345,6 +451,21 @@ class ScoreGraphEdge:
     
     def __repr__(self):
         return f" --> {self.dest.name()}, frontend = {self.frontend}"
+    
+    def shares_structure(self, other):
+        """Whether a path taking either edge would end up in the same place
+        with the same SP and timing requirements. Points aren't compared."""
+        return (
+            self.dest.timecode == other.dest.timecode
+            and self.sp_times == other.sp_times
+            and self.activation_fill_deadline_ms == other.activation_fill_deadline_ms
+            and self.activation_initial_end_times == other.activation_initial_end_times
+            and self.sqinout_time == other.sqinout_time
+            and self.sqinout_timing == other.sqinout_timing
+            and self.late_sqin_count == other.late_sqin_count
+            and self.sqout_time == other.sqout_time
+            and self.sqin_time == other.sqin_time
+        )
         
     def deactivation_type(self, sp_end_time):
         """Which kind of deactivation is possible if this deact edge is reached
@@ -377,28 +498,195 @@ class ScoreGraphEdge:
                 return 'none'
 
 
+class SearchTrace:
+    """Measurements from one GraphPather run, for finding out why some charts
+    take much longer to analyze than others.
+    
+    Each step through the graph is a dict:
+        timecode_ms: Song time that the paths have reached.
+        paths_in: Paths after advancing/branching, before reducing.
+        paths_out: Paths kept for the next step.
+        dominated: Paths eliminated by a better path.
+        filtered: Paths over the ms filter that were eliminated.
+        variants: Paths merged into another path as a variant.
+        beamed: Paths dropped by beam search.
+        advance_s, reduce_s: Time spent advancing/branching and reducing.
+    
+    """
+    def __init__(self, graph):
+        self.node_count = graph.node_count()
+        self.edge_count = graph.edge_count()
+        self.steps = []
+        self.seconds = 0
+        
+        # Set by hyutil.analyze_chart
+        self.parse_seconds = None
+        self.graph_seconds = None
+    
+    def peak_paths(self):
+        return max((step['paths_in'] for step in self.steps), default=0)
+    
+    def total(self, key):
+        return sum(step[key] for step in self.steps)
+    
+    def to_dict(self):
+        return {
+            'node_count': self.node_count,
+            'edge_count': self.edge_count,
+            'seconds': self.seconds,
+            'parse_seconds': self.parse_seconds,
+            'graph_seconds': self.graph_seconds,
+            'steps': self.steps
+        }
+
+
 class GraphPather:
     """Responsible for creating multiple paths and for creating records.
     
     Reads ScoreGraphs; stores a record for the latest graph that was read.
+    After read_shared, there's one record per graph (the first is also
+    available as self.record).
     
     """
     def __init__(self):
         self.record = hydata.HydraRecord()
+        self.records = [self.record]
+        
+        # Worker processes for comparing paths in large frontiers
+        self.workers = None
+        self.pool = None
+        
+        # SearchTrace of the latest read, if asked for
+        self.trace = None
+        self._reduce_counts = None
+    
+    def read(
+        self, graph, depth_mode, depth_value, ms_filter, cb_pathsprogress=None,
+        time_budget=None, frontier_budget=None, beam_width=8,
+        cb_pathsleader=None, cancel=None, ms_frontier=False, e_sweep=None,
+        workers=None, trace=False
+    ):
+        """Run every path through the graph and store the results in a record.
+        
+        cb_pathsleader: Called with a provisional best path string and a lower
+        bound on the optimal score, whenever that lower bound goes up.
+        
+        cancel: Optional CancelToken, checked once per step through the graph.
+        
+        ms_frontier: Instead of filtering with a single ms_filter, keep every
+        path that's the best for *some* ms limit. The record can then be viewed
+        at any ms limit without running the paths again.
+        
+        time_budget: Seconds of analysis before falling back to beam search.
+        frontier_budget: Number of paths held at once before falling back to
+        beam search.
+        beam_width: While in beam search, how many paths to keep per SP bucket.
+        
+        Once beam search kicks in, the record is marked as approximate with a
+        bound on how many points the optimal path could be missing.
         
-    def read(self, graph, depth_mode, depth_value, ms_filter, cb_pathsprogress=None):
-        self.record.ms_limit = ms_filter
-        paths = [GraphPath()]
-        paths[0].currentnode = graph.start
+        e_sweep: Range of calibration offsets (low, high) in ms to cover, so
+        that the record can be viewed at any of those calibrations. Fills that
+        only show up with some calibrations are handled like timing
+        requirements, so this always keeps an ms frontier.
+        
+        workers: Number of processes to split up path comparisons across,
+        once there are enough paths at once for it to be worth it.
+        
+        trace: Collect a SearchTrace of the run in self.trace.
+        """
+        start = GraphPath()
+        start.currentnode = graph.start
+        
+        self._run(
+            start, [graph], depth_mode, depth_value, ms_filter, cb_pathsprogress,
+            time_budget, frontier_budget, beam_width,
+            cb_pathsleader, cancel, ms_frontier, e_sweep, workers, trace
+        )
+    
+    def read_shared(
+        self, graphs, depth_mode, depth_value, ms_filter, cb_pathsprogress=None,
+        time_budget=None, frontier_budget=None, beam_width=8,
+        cb_pathsleader=None, cancel=None, ms_frontier=False, e_sweep=None,
+        workers=None, trace=False
+    ):
+        """Like read, but for several graphs with the same structure (see
+        ScoreGraph.shares_structure), producing one record per graph.
+        
+        The paths only run once: each path carries its points on every graph,
+        and is only eliminated if it's eliminated on all of them. The leader
+        callback and beam search ranking follow the first graph.
+        """
+        assert(all(graphs[0].shares_structure(g) for g in graphs[1:]))
+        
+        self.records = [hydata.HydraRecord() for g in graphs]
+        self.record = self.records[0]
+        
+        members = []
+        for g in graphs:
+            members.append(GraphPath())
+            members[-1].currentnode = g.start
+        
+        self._run(
+            SharedGraphPath(members), graphs, depth_mode, depth_value, ms_filter, cb_pathsprogress,
+            time_budget, frontier_budget, beam_width,
+            cb_pathsleader, cancel, ms_frontier, e_sweep, workers, trace
+        )
+    
+    def _run(
+        self, start, graphs, depth_mode, depth_value, ms_filter, cb_pathsprogress,
+        time_budget, frontier_budget, beam_width,
+        cb_pathsleader, cancel, ms_frontier, e_sweep, workers, trace
+    ):
+        self.workers = workers
+        self.trace = SearchTrace(graphs[0]) if trace else None
+        try:
+            self._run_paths(
+                start, graphs, depth_mode, depth_value, ms_filter, cb_pathsprogress,
+                time_budget, frontier_budget, beam_width,
+                cb_pathsleader, cancel, ms_frontier, e_sweep
+            )
+        finally:
+            if self.pool:
+                self.pool.shutdown(cancel_futures=True)
+                self.pool = None
+    
+    def _run_paths(
+        self, start, graphs, depth_mode, depth_value, ms_filter, cb_pathsprogress,
+        time_budget, frontier_budget, beam_width,
+        cb_pathsleader, cancel, ms_frontier, e_sweep
+    ):
+        if e_sweep:
+            ms_frontier = True
+            for p in start.split():
+                p.max_calibration = e_sweep[1]
+        if ms_frontier:
+            ms_filter = None
+        for record in self.records:
+            record.ms_limit = ms_filter
+            record.ms_frontier = ms_frontier
+            record.depth_mode = depth_mode
+            record.depth_value = depth_value
+            record.e_sweep = tuple(e_sweep) if e_sweep else None
+        paths = [start]
         length = 0
         
+        starttime = time.perf_counter()
+        is_beam = False
+        beam_bound = None
+        leader_bound = None
+        
         # to do: paths should complete at the same time, might improve performance
         while any([not p.is_complete() for p in paths]):
+            if cancel:
+                cancel.check()
+            
+            steptime = time.perf_counter()
             new_paths = []
             for p in paths:
                 assert(not p.is_complete())
                 p.advance()
-                    
+                
                 if p.is_complete():
                     new_paths.append(p)
                     continue
@@ -410,28 +698,125 @@ class GraphPather:
                 else:
                     branchpath = p.branch_activate()
                     new_paths.append(p)
-                    
+                
                 if branchpath:
                     new_paths.append(branchpath)
-                
-            # Update the path list with branching results
-            paths = self.reduced_paths(new_paths, depth_mode, depth_value, ms_filter)
-        
+            
+            # Update the path list with branching results. Comparing lots of
+            # paths can take a while, so it stops once the time budget is up
+            # and the beam takes over from there.
+            reducetime = time.perf_counter()
+            deadline = None if is_beam or time_budget is None else starttime + time_budget
+            paths = self.reduced_paths(new_paths, depth_mode, depth_value, ms_filter, ms_frontier, e_sweep, deadline)
+            reduced_count = len(paths)
+            
+            # Over budget: Switch to only keeping the best few paths
+            if not is_beam and (
+                (time_budget is not None and time.perf_counter() - starttime > time_budget)
+                or (frontier_budget is not None and len(paths) > frontier_budget)
+            ):
+                is_beam = True
+            
+            if is_beam:
+                paths, bound = self.beamed_paths(paths, beam_width, graphs)
+                if bound is not None:
+                    beam_bound = bound if beam_bound is None else tuple(map(max, beam_bound, bound))
+            
+            if self.trace:
+                tc = paths[0].currentnode.timecode if paths[0].currentnode else None
+                self.trace.steps.append({
+                    'timecode_ms': tc.ms if tc else None,
+                    'paths_in': len(new_paths),
+                    'paths_out': len(paths),
+                    **self._reduce_counts,
+                    'beamed': reduced_count - len(paths),
+                    'advance_s': reducetime - steptime,
+                    'reduce_s': time.perf_counter() - reducetime
+                })
+            
             length += 1
             if cb_pathsprogress:
                 tc = paths[0].currentnode.timecode if paths[0].currentnode else None
-                cb_pathsprogress(tc, length / graph.length)
+                cb_pathsprogress(tc, length / graphs[0].length)
+            
+            if cb_pathsleader:
+                leader, bound = self.leading_path(paths, ms_filter, graphs[0])
+                if leader and (leader_bound is None or bound > leader_bound):
+                    leader_bound = bound
+                    cb_pathsleader(leader.data.pathstring(), bound)
+        
+        if self.trace:
+            self.trace.seconds = time.perf_counter() - starttime
+        
+        for i, record in enumerate(self.records):
+            finished = [p.split()[i] for p in paths]
+            if len(graphs) > 1:
+                # Shared paths are kept if they're within depth on any graph,
+                # so trim each record back to its own depth
+                finished = self.reduced_paths(finished, depth_mode, depth_value, ms_filter, ms_frontier, e_sweep)
+            
+            # Order the completed paths by score
+            finished.sort(key=lambda p: p.data.totalscore(), reverse=True)
+            
+            # Finalize paths and copy from processing objects to hydata
+            for path in finished:
+                path.data.leftover_sp = path.sp
+                path.data.prepare_variants()
+                record._paths.append(path.data)
+            
+            if is_beam:
+                best_score = finished[0].data.totalscore()
+                # Nothing dropped (the beam never had to cut) means it's exact
+                if beam_bound is not None:
+                    record.approx_gap = max(0, beam_bound[i] - best_score)
+    
+    def leading_path(self, paths, ms_filter, graph):
+        """The path that's currently furthest ahead, and the score it's
+        guaranteed to finish with (it can always just stop activating).
+        
+        All paths are at the same point in the song with the same base points
+        left to go, so this is just the highest score so far. No sorting.
+        """
+        leader = max(paths, key=lambda p: p.data.totalscore())
+        if ms_filter is not None and not leader.data.passes_ms_filter(ms_filter):
+            leader = max(
+                (p for p in paths if p.data.passes_ms_filter(ms_filter)),
+                key=lambda p: p.data.totalscore(), default=None
+            )
+            if leader is None:
+                return None, None
+        
+        tc = leader.currentnode.timecode if leader.currentnode else None
+        return leader, leader.data.totalscore() + graph.remaining_points(tc)
+    
+    def beamed_paths(self, paths, beam_width, graphs):
+        """Keep only the highest scoring paths in each SP bucket.
         
-        # Order the completed paths by score
-        paths.sort(key=lambda p: p.data.totalscore(), reverse=True)
+        Returns the kept paths and, for each graph, the highest score that any
+        dropped path could have possibly finished with (or None if nothing
+        was dropped).
+        """
+        buckets = {}
+        for p in paths:
+            key = (p.is_active_sp(), 0 if p.is_complete() else p.sp)
+            buckets.setdefault(key, []).append(p)
+        
+        kept = set()
+        bound = None
+        for bucket in buckets.values():
+            bucket.sort(key=lambda p: p.scores(), reverse=True)
+            kept.update(bucket[:beam_width])
+            for p in bucket[beam_width:]:
+                tc = p.currentnode.timecode if p.currentnode else None
+                p_bound = tuple(
+                    score + graph.remaining_points(tc, with_sp=True)
+                    for score, graph in zip(p.scores(), graphs)
+                )
+                bound = p_bound if bound is None else tuple(map(max, bound, p_bound))
         
-        # Finalize paths and copy from processing objects to hydata
-        for path in paths:
-            path.data.leftover_sp = path.sp
-            path.data.prepare_variants()
-            self.record._paths.append(path.data)    
+        return [p for p in paths if p in kept], bound
     
-    def reduced_paths(self, paths, depth_mode, depth_value, ms_filter):
+    def reduced_paths(self, paths, depth_mode, depth_value, ms_filter, ms_frontier=False, e_sweep=None, deadline=None):
         """Reduce the number of paths along the way by eliminating paths
         that are definitely not as good as another path.
         
@@ -448,28 +833,65 @@ class GraphPather:
         
         ms_filter: Remove paths that have timing requirements more difficult
         than this millisecond value.
+        
+        ms_frontier: Only let a path be eliminated by paths that are at most
+        as difficult. The result is the frontier of score vs. difficulty, so
+        it covers every ms_filter at once.
+        
+        e_sweep: With a range of calibrations, a path is only eliminated by
+        paths that are possible with every calibration it's possible with, and
+        that are at most as difficult with any calibration in the range.
+        
+        Shared paths have a score per graph, and a path is only better than
+        another if it's at least as good on every graph.
+        
+        deadline: A time.perf_counter() time to stop comparing at. Paths that
+        weren't compared by then are kept.
         """
         # Since all the paths are at the same point in the song, the only
         # thing that can make 2 paths not comparable is SP: SP represents
         # an unknown amount of points that has yet to be realized. If a path
         # has less points but more SP, it's unclear if the path is better or
         # worse at this time.
-        # 
+        #
         # At the end of the song, all paths of course become comparable
         # by their final scores.
         #
         # Both Active SP: Only comparable if same sp value.
         # Both Inactive SP: Score and SP value comparisons must not contradict.
         # Different SP Active: Not comparable
-
+        
         filtered_paths = set()
         paths_to_remove = set()
+        variants = set()
         
         if ms_filter is not None:
             for p in paths:
                 if not p.data.passes_ms_filter(ms_filter):
                     filtered_paths.add(p)
         
+        # Difficulty as (easiest, hardest) across the range of calibrations,
+        # where no timing requirements is the easiest
+        difficulties = {}
+        min_calibrations = {}
+        # Calibrations below the sweep are never viewed, so they don't set
+        # paths apart
+        if e_sweep:
+            for p in paths:
+                difficulties[p] = p.data.difficulty_range(*e_sweep)
+                min_calibrations[p] = max(p.data.min_calibration(), e_sweep[0])
+        elif ms_frontier:
+            for p in paths:
+                d = p.data.difficulty()
+                difficulties[p] = (-math.inf, -math.inf) if d is None else (d, d)
+        
+        # Shared paths have a tuple of scores, otherwise just use the score
+        is_shared = bool(paths) and isinstance(paths[0], SharedGraphPath)
+        if is_shared:
+            scores = {p: p.scores() for p in paths}
+        else:
+            scores = {p: p.data.totalscore() for p in paths}
+        
         # Separate active SP and inactive SP paths
         # Reduces amount of obviously ineffective comparisons in a sec
         pathgroups = {
@@ -480,92 +902,201 @@ class GraphPather:
             # Don't consider paths that recently SqIn/SqOuted as they have
             # interacted with an SP phrase earlier than other paths.
             if p.buffered_sqinout_sp == 0 and p not in paths_to_remove:
-                pathgroups[p.is_active_sp()].append(p)                
-        
-        worsethan_scores = {p: set() for p in paths}
+                pathgroups[p.is_active_sp()].append(p)
+        
+        for is_active, group in pathgroups.items():
+            # Compact keys for comparing, which can be sent to other processes
+            keys = []
+            for p in group:
+                if is_active:
+                    # Active SP paths: Comparable only if SP ends at the same time
+                    sp_key = p.sp_end_time.ticks
+                else:
+                    sp_key = 0 if p.is_complete() else p.sp
+                keys.append((
+                    sp_key, scores[p], p in filtered_paths,
+                    difficulties.get(p), min_calibrations.get(p)
+                ))
+            
+            if not is_active:
+                # Variants - inactive SP paths with the same key have converged
+                # at this point and any further pathing will affect them
+                # identically. The first of the converged paths continues
+                # analysis and the others become its variants.
+                firsts = {}
+                for i, key in enumerate(keys):
+                    if key in firsts:
+                        group[firsts[key]].add_variant(group[i])
+                        paths_to_remove.add(group[i])
+                        variants.add(group[i])
+                    else:
+                        firsts[key] = i
+                
+                # Only the paths that continue need to be compared
+                group = [group[i] for i in firsts.values()]
+                keys = list(firsts)
+            
+            time_left = None if deadline is None else deadline - time.perf_counter()
+            args = (is_active, depth_mode, depth_value, ms_frontier, e_sweep, is_shared, time_left)
+            if self.workers and self.workers > 1 and len(keys) >= PARALLEL_MIN_PATHS:
+                if self.pool is None:
+                    # Spawned, so workers don't copy a process with threads running
+                    self.pool = concurrent.futures.ProcessPoolExecutor(
+                        self.workers, mp_context=multiprocessing.get_context('spawn')
+                    )
+                # Each worker takes a block of rows, which only needs the keys
+                # from its first row on
+                starts = shard_starts(len(keys), self.workers)
+                ends = starts[1:] + [len(keys)]
+                futures = [
+                    self.pool.submit(compare_paths, keys[start:], range(end - start), *args)
+                    for start, end in zip(starts, ends)
+                ]
+                results = [(start, f.result()) for start, f in zip(starts, futures)]
+            else:
+                results = [(0, compare_paths(keys, range(len(keys)), *args))]
+            
+            # Merge the results from each shard
+            beaten_by = {}
+            for start, (removed, shard_beaten_by) in results:
+                paths_to_remove.update(group[start + i] for i in removed)
+                for i, better_scores in shard_beaten_by.items():
+                    beaten_by.setdefault(start + i, set()).update(better_scores)
+            
+            if depth_mode == 'scores':
+                for i, better_scores in beaten_by.items():
+                    # Scores that are distinct on one graph can be tied on another
+                    if len(better_scores) > depth_value and (not is_shared or all(
+                        len({s[m] for s in better_scores}) > depth_value
+                        for m in range(len(keys[i][1]))
+                    )):
+                        paths_to_remove.add(group[i])
+        
+        eliminated = paths_to_remove - variants
+        self._reduce_counts = {
+            'dominated': len(eliminated - filtered_paths),
+            'filtered': len(eliminated & filtered_paths),
+            'variants': len(variants)
+        }
         
-        for p, q in combinations(pathgroups[True], 2):
-            # Active SP paths: Compare score only if SP is the same
-            if p.sp_end_time != q.sp_end_time:
-                continue
-               
-            score_diff = q.data.totalscore() - p.data.totalscore()
-            if score_diff < 0:
-                better, worse = (p, q)
-            elif score_diff > 0:
-                better, worse = (q, p)
+        return [p for p in paths if p not in paths_to_remove]
+
+
+def shard_starts(count, shards):
+    """First rows of blocks of rows that each have about as many comparisons
+    to do (with every row after them) in compare_paths."""
+    return sorted({int(count * (1 - math.sqrt(1 - i / shards))) for i in range(shards)})
+
+def compare_paths(keys, rows, is_active, depth_mode, depth_value, ms_frontier, e_sweep, is_shared, time_left=None):
+    """Compare the paths at the given rows against every path after them.
+    
+    Paths are given as keys (sp, score, is_filtered, difficulty,
+    min_calibration) from GraphPather.reduced_paths, so that this can run in
+    another process.
+    
+    Converged paths (same key) should already be merged as variants.
+    
+    With time_left (seconds), comparing stops once it runs out, and the rows
+    that are left keep their paths.
+    
+    Returns indexes of paths to remove, and the better scores that each path
+    has been beaten by (for 'scores' depth).
+    """
+    removed = set()
+    beaten_by = {}
+    stoptime = None if time_left is None else time.perf_counter() + time_left
+    
+    for i in rows:
+        if stoptime is not None and time.perf_counter() > stoptime:
+            break
+        p_sp, p_score, p_filtered, p_difficulty, p_calibration = keys[i]
+        for j in range(i + 1, len(keys)):
+            q_sp, q_score, q_filtered, q_difficulty, q_calibration = keys[j]
+            
+            if is_shared:
+                score_cmp = compare_scores(p_score, q_score)
+                if score_cmp is None:
+                    # Better on some graphs and worse on others
+                    continue
             else:
-                continue
-                
-            if worse in filtered_paths:
-                paths_to_remove.add(worse)
-                continue
+                score_diff = q_score - p_score
+                score_cmp = (score_diff > 0) - (score_diff < 0)
+            
+            if is_active:
+                # Active SP paths: Compare score only if SP is the same
+                if p_sp != q_sp:
+                    continue
+                sp_diff = 0
+                cmp = score_cmp
+            else:
+                # Inactive SP paths: Compare both SP meter and score.
+                # A path must be either better in both or better in one and
+                # tied in the other
+                sp_diff = q_sp - p_sp
+                if sp_diff == score_cmp == 0:
+                    # Same SP and score, but different timing requirements
+                    continue
                 
-            if depth_mode == 'points':
-                if better not in filtered_paths and worse.data.totalscore() + depth_value < better.data.totalscore():
-                    paths_to_remove.add(worse)
-            elif depth_mode == 'scores':
-                if better not in filtered_paths:
-                    worsethan_scores[worse].add(better.data.totalscore())
-                    if len(worsethan_scores[worse]) > depth_value:
-                        paths_to_remove.add(worse)
-            
-        marked_variants = set()
-        for p, q in combinations(pathgroups[False], 2):
-            # Inactive SP paths: Compare both SP meter and score.
-            # A path must be either better in both or better in one and 
-            # tied in the other
-            if p in marked_variants or q in marked_variants:
-                continue
+                cmp = (sp_diff > 0) - (sp_diff < 0) + score_cmp
             
-            cmp = 0
-            p_sp = 0 if p.is_complete() else p.sp
-            q_sp = 0 if q.is_complete() else q.sp
-            
-            sp_diff = q_sp - p_sp
-            if sp_diff > 0:
-                cmp += 1
-            elif sp_diff < 0:
-                cmp -= 1
-            
-            score_diff = q.data.totalscore() - p.data.totalscore()
-            if score_diff > 0:
-                cmp += 1
-            elif score_diff < 0:
-                cmp -= 1
-            
-            if sp_diff == score_diff == 0:
-                # The two paths have converged at this point and any further
-                # pathing will affect them identically
-                if (p in filtered_paths) == (q in filtered_paths):
-                    # Variants - p will continue analysis and q will become a variant
-                    p.data.variants.append(q.data)
-                    q.data.var_point = len(p.data)
-                    marked_variants.add(q)
-                    paths_to_remove.add(q)                
+            # With the same SP, a graph where the scores are tied keeps both
+            # paths, so a shared path is only beaten if it's beaten on each
+            if is_shared and sp_diff == 0 and any(p == q for p, q in zip(p_score, q_score)):
+                continue
             
             if cmp < 0:
-                better, worse = (p, q)
+                better, worse = (i, j)
             elif cmp > 0:
-                better, worse = (q, p)
+                better, worse = (j, i)
             else:
                 continue
-                
-            if worse in filtered_paths:
-                paths_to_remove.add(worse)
+            
+            _, better_score, better_filtered, better_difficulty, better_calibration = keys[better]
+            _, worse_score, worse_filtered, worse_difficulty, worse_calibration = keys[worse]
+            
+            # Can't eliminate a path that's easier in some situation
+            if ms_frontier and better_difficulty[1] > worse_difficulty[0]:
                 continue
-                
+            if e_sweep and better_calibration > worse_calibration:
+                continue
+            
+            if worse_filtered:
+                removed.add(worse)
+                continue
+            
+            if better_filtered:
+                continue
+            
             if depth_mode == 'points':
-                if better not in filtered_paths and worse.data.totalscore() + depth_value < better.data.totalscore():
-                    paths_to_remove.add(worse)   
+                if is_shared:
+                    if all(w + depth_value < b for w, b in zip(worse_score, better_score)):
+                        removed.add(worse)
+                elif worse_score + depth_value < better_score:
+                    removed.add(worse)
             elif depth_mode == 'scores':
-                if better not in filtered_paths:
-                    worsethan_scores[worse].add(better.data.totalscore())
-                    if len(worsethan_scores[worse]) > depth_value:
-                        paths_to_remove.add(worse)
-            
-        return [p for p in paths if p not in paths_to_remove]
-        
+                beaten_by.setdefault(worse, set()).add(better_score)
+    
+    return removed, beaten_by
+
+
+def compare_scores(p_scores, q_scores):
+    """Compare two paths' scores (one per graph).
+    
+    1 if q is at least as high on every graph and higher on one, -1 for the
+    reverse, 0 if they're the same, and None if each is higher somewhere.
+    """
+    cmp = 0
+    for p_score, q_score in zip(p_scores, q_scores):
+        if q_score > p_score:
+            if cmp < 0:
+                return None
+            cmp = 1
+        elif q_score < p_score:
+            if cmp > 0:
+                return None
+            cmp = -1
+    return cmp
+
 class GraphPath:
     """Quick early note:
     
@@ -584,7 +1115,8 @@ class GraphPath:
             self.buffered_sqinout_sp = parent_path.buffered_sqinout_sp
             self.sp_end_time = parent_path.sp_end_time
             self.sp_ready_time = parent_path.sp_ready_time
-            self.skipped_e_offset = parent_path.skipped_e_offset
+            self.skipped_e_offsets = parent_path.skipped_e_offsets
+            self.max_calibration = parent_path.max_calibration
         else:
             self.data = hydata.Path()
             
@@ -594,7 +1126,8 @@ class GraphPath:
             self.buffered_sqinout_sp = 0 # sp that was handled during a recent sqin/sqout, and needs to not be double counted
             self.sp_end_time = None
             self.sp_ready_time = None
-            self.skipped_e_offset = None
+            self.skipped_e_offsets = ()
+            self.max_calibration = 0 # highest calibration offset being considered, which lets the most fills show up
     
     # Develop along the edge that leads farther into the song.
     # Always moves a path closer to being complete, unless it's already complete.
@@ -668,7 +1201,7 @@ class GraphPath:
         e_offset = br_edge.activation_fill_deadline_ms - self.sp_ready_time.ms
         
         # Thanks to the timing window, the cutoff is -70ms not 0ms
-        if e_offset < -70:
+        if e_offset + self.max_calibration < -70:
             return None
                     
         new_path = GraphPath(parent_path=self)
@@ -684,11 +1217,12 @@ class GraphPath:
         new_act.chord = self.currentnode.chord
         new_act.sp_meter = self.sp
         new_act.frontend_points = br_edge.frontend.points
-        new_act.e_offset = self.skipped_e_offset if self.skipped_e_offset is not None else e_offset
+        new_act.fill_e_offsets = self.skipped_e_offsets + (e_offset,)
+        new_act.e_offset = new_act.fill_e_offsets[0]
         
         new_path.data._activations.append(new_act)
         new_path.data.score_sp += br_edge.frontend.points
-        new_path.skipped_e_offset = None
+        new_path.skipped_e_offsets = ()
         new_path.sp_ready_time = None
         new_path.sp_end_time = br_edge.activation_initial_end_times[self.sp]
         
@@ -704,8 +1238,7 @@ class GraphPath:
                 self.data.skipped_ghosts += 1
             
         # Even if the E fill is skipped, the eventual activation should know about it
-        if self.skipped_e_offset is None:
-            self.skipped_e_offset = e_offset
+        self.skipped_e_offsets += (e_offset,)
     
         return new_path
         
@@ -773,6 +1306,82 @@ class GraphPath:
         if self.is_complete():
             return False
         return self.currentnode.is_sp
+    
+    def scores(self):
+        return (self.data.totalscore(),)
+    
+    def add_variant(self, other):
+        """Make another path (which has converged with this one) a variant."""
+        self.data.variants.append(other.data)
+        other.data.var_point = len(self.data)
+    
+    def split(self):
+        return [self]
+
+
+class SharedGraphPath:
+    """A path that makes the same choices on several ScoreGraphs that share
+    a structure, so it only has to be run once for all of them.
+    
+    Everything about the path's SP and position is the same on every graph,
+    so that's read from the first one. Only the points differ.
+    
+    """
+    def __init__(self, members):
+        self.members = members
+    
+    @property
+    def data(self):
+        return self.members[0].data
+    
+    @property
+    def currentnode(self):
+        return self.members[0].currentnode
+    
+    @property
+    def sp(self):
+        return self.members[0].sp
+    
+    @property
+    def sp_end_time(self):
+        return self.members[0].sp_end_time
+    
+    @property
+    def buffered_sqinout_sp(self):
+        return self.members[0].buffered_sqinout_sp
+    
+    def advance(self):
+        for m in self.members:
+            m.advance()
+    
+    def branch_activate(self):
+        branches = [m.branch_activate() for m in self.members]
+        if branches[0] is None:
+            return None
+        return SharedGraphPath(branches)
+    
+    def branch_deactivate(self):
+        results = [m.branch_deactivate() for m in self.members]
+        can_extend, branch = results[0]
+        if branch is None:
+            return can_extend, None
+        return can_extend, SharedGraphPath([r[1] for r in results])
+    
+    def is_complete(self):
+        return self.members[0].is_complete()
+    
+    def is_active_sp(self):
+        return self.members[0].is_active_sp()
+    
+    def scores(self):
+        return tuple(m.data.totalscore() for m in self.members)
+    
+    def add_variant(self, other):
+        for m, other_m in zip(self.members, other.members):
+            m.add_variant(other_m)
+    
+    def split(self):
+        return self.members
 
 
 def category_scores(chord, combo):
@@ -148,6 +148,7 @@ class MidiParser:
     """Reads a .mid file to create a Song object."""
     def __init__(self):
         self.song = None
+        self.mid = None
         
         # Parsing mode
         self.mode_difficulty = None
@@ -404,12 +405,27 @@ class MidiParser:
             
         self._msg_buffer = []
     
-    def parsefile(self, filename, m_difficulty, m_pro, m_bass2x):
+    def parsefile(self, filename, m_difficulty, m_pro, m_bass2x, cancel=None):
         """After calling this, self.song will reflect the input filename.
         Must be .mid.
+        
+        cancel: Optional CancelToken, checked once per timestamp.
         """
-        # Load from MIDI
-        mid = mido.MidiFile(filename, clip=True)
+        self.loadfile(filename)
+        self.parse(m_difficulty, m_pro, m_bass2x, cancel)
+    
+    def loadfile(self, filename):
+        """Load from MIDI without making a Song yet."""
+        self.mid = mido.MidiFile(filename, clip=True)
+    
+    def load_from(self, other):
+        """Share another parser's loaded file, to parse it in another mode
+        without loading it again."""
+        self.mid = other.mid
+    
+    def parse(self, m_difficulty, m_pro, m_bass2x, cancel=None):
+        """Make self.song from the loaded file."""
+        mid = self.mid
         
         # Parser settings
         self.mode_difficulty = m_difficulty
@@ -442,6 +458,8 @@ class MidiParser:
                 self._dynamics_enabled = False
                 for msg in track:
                     if msg.time != 0:
+                        if cancel:
+                            cancel.check()
                         # Process timestamp first
                         self.push_timestamp(elapsed_ticks)
                         elapsed_ticks += msg.time
@@ -799,14 +817,27 @@ class ChartParser:
                     except hymisc.ChartFileError:
                         pass
         
-    def parsefile(self, filename, m_difficulty, m_pro, m_bass2x):
+    def parsefile(self, filename, m_difficulty, m_pro, m_bass2x, cancel=None):
         """After this function, self.song will be ready.
         Must be .chart.
+        
+        cancel: Optional CancelToken, checked once per timestamp.
         """
-        # Load from txt
+        self.loadfile(filename)
+        self.parse(m_difficulty, m_pro, m_bass2x, cancel)
+    
+    def loadfile(self, filename):
+        """Load from txt without making a Song yet."""
         with open(filename, mode='r') as charttxt:
             self.load_sections(charttxt)
-        
+    
+    def load_from(self, other):
+        """Share another parser's loaded sections, to parse them in another
+        mode without loading the file again."""
+        self.sections = other.sections
+    
+    def parse(self, m_difficulty, m_pro, m_bass2x, cancel=None):
+        """Make self.song from the loaded sections."""
         # Parser settings
         self.mode_difficulty = m_difficulty
         self.mode_pro = m_pro
@@ -829,6 +860,8 @@ class ChartParser:
         # Add from the drum chart to our Song
         if 'ExpertDrums' in self.sections:
             for tick, tick_entries in self.sections['ExpertDrums'].data.items():
+                if cancel:
+                    cancel.check()
                 self.push_timestamp(tick, tick_entries)
         
         self.song.check_activations()
@@ -5,70 +5,115 @@ import configparser
 import pathlib
 import hashlib
 import time
+import concurrent.futures
 
 from . import hypath
 from . import hydata
 from . import hysong
 from . import hymisc
+from . import hycodec
 
+
+# (m_pro, m_bass2x) for every chartmode of a difficulty
+CHARTMODES = [(True, True), (True, False), (False, True), (False, False)]
+
+# Set in pool workers by init_analysis_worker
+_worker_cancel = None
     
-def discover_charts(rootfolders, cb_progress=None):
+def discover_charts(rootfolders, cb_progress=None, workers=None, progress_interval=0.1):
     """Returns a list of tuples (chartfile, inifile, chartfolder, subfolders)
     and a list of encountered errors.
     
-    Recursively searches for charts in the given root folders.
+    Recursively searches for charts in the given root folders. Folders are
+    listed on a thread pool (of the given number of workers), since listing
+    is mostly waiting on the disk or network.
+    
+    Roots inside other roots are searched as their own roots only. Symlinked
+    folders are only followed once each, so links can't make the search loop.
+    
+    cb_progress gets the number of chart folders found so far, on this
+    thread, at most once per progress_interval seconds and once at the end.
     """
-    try:
-        # (current search path, original root folder)
-        unexplored = [(root, root) for root in rootfolders]
-    except FileNotFoundError as e:
-        return ([], [e])
+    # Absolute path --> root, without repeats
+    roots = {}
+    for root in rootfolders:
+        roots.setdefault(os.path.abspath(root), root)
     
     # Fill out chart files found in a given folder, not necessarily in order
     found_by_dirname = {}
     errors = []
-    visited = set()
-    while unexplored:
-        f, origin = unexplored.pop()
+    # (st_dev, st_ino) of symlinked folders that were followed
+    linked = set()
+    progresstime = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        # Future --> original root folder
+        pending = {}
+        def explore(folder, origin, link=None):
+            if link is not None:
+                if link in linked:
+                    return
+                linked.add(link)
+            pending[pool.submit(_scan_folder, folder)] = origin
         
-        if os.path.isfile(f):
-            dir, base = os.path.split(f)
-            
-            if base in ["notes.mid", "notes.chart"]:
-                i = 0
-            elif base == "song.ini":
-                i = 1
-            else:
-                continue
-                
-            if dir not in found_by_dirname:
-                found_by_dirname[dir] = [
-                    None, None,
-                    dir, os.path.relpath(pathlib.Path(dir).parent, origin)
-                ]
-            found_by_dirname[dir][i] = f
+        for root in roots.values():
+            explore(root, root)
         
-            if cb_progress:
-                cb_progress(len(found_by_dirname))
-        else:
-            # Handle a folder - add subfolders to the search
-            try:
-                subnames = os.listdir(f)
-            except Exception as e:
-                errors.append(e)
-                continue
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                origin = pending.pop(future)
+                try:
+                    folder, chartfile, inifile, subfolders = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                
+                for subfolder, link in subfolders:
+                    if os.path.abspath(subfolder) not in roots:
+                        explore(subfolder, origin, link)
                 
-            for subname in subnames:
-                subpath = os.sep.join([f, subname])
-                if subpath not in visited:
-                    visited.add(subpath)
-                    unexplored.append((subpath, origin))
+                if chartfile or inifile:
+                    found_by_dirname[folder] = [
+                        chartfile, inifile,
+                        folder, os.path.relpath(pathlib.Path(folder).parent, origin)
+                    ]
+            
+            if cb_progress and time.perf_counter() - progresstime >= progress_interval:
+                progresstime = time.perf_counter()
+                cb_progress(len(found_by_dirname))
+    
+    if cb_progress:
+        cb_progress(len(found_by_dirname))
     
     return (
         [tuple(info) for info in found_by_dirname.values() if all(info)],
         errors
     )
 
+def _scan_folder(folder):
+    """One folder's chart file, ini file, and subfolders (using scandir's
+    file types instead of a stat per entry).
+    
+    Subfolders come with the (st_dev, st_ino) of where they lead if they're
+    symlinks, or None.
+    """
+    chartfile = None
+    inifile = None
+    subfolders = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                if entry.is_symlink():
+                    stat = entry.stat()
+                    subfolders.append((entry.path, (stat.st_dev, stat.st_ino)))
+                else:
+                    subfolders.append((entry.path, None))
+            elif entry.name in ["notes.mid", "notes.chart"]:
+                chartfile = entry.path
+            elif entry.name == "song.ini":
+                inifile = entry.path
+    return folder, chartfile, inifile, subfolders
+
 
 def get_folder_chart(folder):
     """Non-recursive lookup for a chart file in the given folder."""
@@ -79,6 +124,13 @@ def get_folder_chart(folder):
                 return filepath
     return None
 
+def get_filestats(chartfile, inifile):
+    """(size, mtime_ns) of the chart file and the ini, to tell if either
+    changed since the last scan."""
+    chartstat = os.stat(chartfile)
+    inistat = os.stat(inifile)
+    return (chartstat.st_size, chartstat.st_mtime_ns, inistat.st_size, inistat.st_mtime_ns)
+
 def get_rowvalues(chartfile, inifile, path, subfolders):
     config = configparser.ConfigParser(
         strict=False, allow_no_value=True, interpolation=None
@@ -103,21 +155,11 @@ def get_rowvalues(chartfile, inifile, path, subfolders):
     with open(chartfile, 'rb') as f:
         hyhash = hashlib.file_digest(f, "md5").hexdigest()
     
-    # Grab our desired metadata
-    try:
-        name = metadata['name']
-    except KeyError:
-        name = "<unknown name>"
-        
-    try:
-        artist = metadata['artist']
-    except KeyError:
-        artist = "<unknown artist>"
-        
-    try:
-        charter = metadata['charter']
-    except KeyError:
-        charter = "<unknown charter>"
+    # Grab our desired metadata. A key without a value (allowed by the
+    # parser) counts as missing, so the library never has NULLs to sort on
+    name = metadata.get('name') or "<unknown name>"
+    artist = metadata.get('artist') or "<unknown artist>"
+    charter = metadata.get('charter') or "<unknown charter>"
 
     return (hyhash, name, artist, charter, path, subfolders)
 
@@ -127,32 +169,63 @@ def analyze_chart(
     d_mode, d_value,
     ms_filter=None,
     cb_parsecomplete=None, cb_pathsprogress=None,
-    export_tempomap=False
+    export_tempomap=False,
+    time_budget=None, frontier_budget=None, beam_width=8,
+    cb_pathsleader=None, cancel=None, ms_frontier=False, e_sweep=None,
+    workers=None, trace=False
 ):
     """The full process to go from chart file to hydata.
     
     It's more or less a chain: Chart --> Song --> Graph --> Record.
     
+    Budgets (seconds of pathing / paths held at once) make analysis fall back
+    to a beam search instead of running indefinitely. Records from a beam
+    search are marked as approximate.
+    
+    cb_pathsleader streams the best path so far (pathstring, score lower bound)
+    while the paths are still running.
+    
+    cancel is an optional hymisc.CancelToken. Parsing, graph building and
+    pathing all check it, and raise hymisc.AnalysisCancelled once it's set.
+    
+    ms_frontier keeps the best paths for every ms limit at once instead of
+    using ms_filter; see HydraRecord.view_paths.
+    
+    e_sweep (low, high) keeps the best paths for every calibration offset in
+    that range as well, which can also be viewed with HydraRecord.view_paths.
+    
+    workers splits up comparing paths across that many processes when there
+    are a lot of paths at once.
+    
+    trace=True also returns a hypath.SearchTrace with the graph size, timings,
+    and how many paths there were at each step: (record, trace), or
+    (record, tempo_map, trace) with export_tempomap.
+    
     """
-    # Parse chart file and make a song object
-    if filepath.endswith(".mid"):
-        parser = hysong.MidiParser()
-    elif filepath.endswith(".chart"):
-        parser = hysong.ChartParser()
-    else:
-        raise hymisc.ChartFileError(f"Unexpected chart filetype: {filepath}")
+    starttime = time.perf_counter()
     
-    parser.parsefile(filepath, m_difficulty, m_pro, m_bass2x)
+    # Parse chart file and make a song object
+    parser = chart_parser(filepath)
+    parser.parsefile(filepath, m_difficulty, m_pro, m_bass2x, cancel)
+    parsetime = time.perf_counter()
     
     if cb_parsecomplete:
         cb_parsecomplete()
     
     # Use song object to make a score graph
-    graph = hypath.ScoreGraph(parser.song)
+    graphstart = time.perf_counter()
+    graph = hypath.ScoreGraph(parser.song, cancel)
+    graphtime = time.perf_counter()
     
     # Use score graph to run the paths
     pather = hypath.GraphPather()
-    pather.read(graph, d_mode, d_value, ms_filter, cb_pathsprogress)
+    pather.read(
+        graph, d_mode, d_value, ms_filter, cb_pathsprogress,
+        time_budget, frontier_budget, beam_width,
+        cb_pathsleader, cancel, ms_frontier, e_sweep, workers, trace
+    )
+    
+    result = (pather.record,)
     
     if export_tempomap:
         tempo_map = {
@@ -160,9 +233,144 @@ def analyze_chart(
             'tpm': {t: v for t,v in parser.song.tpm_changes.items()},
             'bpm': {t: v for t,v in parser.song.bpm_changes.items()}
         }
-        return (pather.record, tempo_map)
+        result += (tempo_map,)
+    
+    if trace:
+        pather.trace.parse_seconds = parsetime - starttime
+        pather.trace.graph_seconds = graphtime - graphstart
+        result += (pather.trace,)
+    
+    return result if len(result) > 1 else pather.record
+
+def analyze_chart_modes(
+    filepath,
+    m_difficulty,
+    d_mode, d_value,
+    chartmodes=CHARTMODES,
+    ms_filter=None,
+    cb_parsecomplete=None, cb_pathsprogress=None,
+    export_tempomap=False,
+    time_budget=None, frontier_budget=None, beam_width=8,
+    cancel=None, ms_frontier=False, e_sweep=None, workers=None
+):
+    """Analyze several chartmodes (m_pro, m_bass2x) of one difficulty at once.
+    
+    Returns a dict of chartmode --> record, with the same options as
+    analyze_chart.
+    
+    Chartmodes usually only differ in points, not in SP phrases, fills or
+    timing. Those that share a graph structure are pathed together in one run;
+    any that don't get their own run.
+    
+    """
+    # Load the file once and parse it in each chartmode
+    source = chart_parser(filepath)
+    source.loadfile(filepath)
+    
+    graphs = {}
+    song = None
+    for m_pro, m_bass2x in chartmodes:
+        parser = chart_parser(filepath)
+        parser.load_from(source)
+        parser.parse(m_difficulty, m_pro, m_bass2x, cancel)
+        song = parser.song
+        graphs[(m_pro, m_bass2x)] = hypath.ScoreGraph(parser.song, cancel)
+    
+    if cb_parsecomplete:
+        cb_parsecomplete()
+    
+    # Group up chartmodes that can be pathed together
+    groups = []
+    for chartmode, graph in graphs.items():
+        for group in groups:
+            if graphs[group[0]].shares_structure(graph):
+                group.append(chartmode)
+                break
+        else:
+            groups.append([chartmode])
+    
+    records = {}
+    for group in groups:
+        pather = hypath.GraphPather()
+        pather.read_shared(
+            [graphs[chartmode] for chartmode in group],
+            d_mode, d_value, ms_filter, cb_pathsprogress,
+            time_budget, frontier_budget, beam_width,
+            None, cancel, ms_frontier, e_sweep, workers
+        )
+        for chartmode, record in zip(group, pather.records):
+            records[chartmode] = record
+    
+    if export_tempomap:
+        tempo_map = {
+            'res': song.tick_resolution,
+            'tpm': {t: v for t,v in song.tpm_changes.items()},
+            'bpm': {t: v for t,v in song.bpm_changes.items()}
+        }
+        return (records, tempo_map)
+    
+    return records
+
+def analyze_chart_job(messages, cancel_event, filepath, *args, **kwargs):
+    """Runs analyze_chart (with a tempo map) for the app, usually in a
+    worker process, posting to the messages queue as it goes:
+    
+    ('parsed',)
+    ('progress', measure string, fraction done)
+    ('leader', pathstring, score lower bound)
+    
+    and then one of these to finish:
+    
+    ('done', record data (see hycodec), tempo map)
+    ('cancelled',)
+    ('error', description)
+    
+    cancel_event is an Event the app sets to cancel the analysis.
+    
+    """
+    def on_progress(timecode, progressf):
+        s = timecode.measurestr(fixed_width=True) if timecode else ""
+        messages.put(('progress', s, progressf))
+    
+    try:
+        record, tempomap = analyze_chart(
+            filepath, *args,
+            cb_parsecomplete=lambda: messages.put(('parsed',)),
+            cb_pathsprogress=on_progress,
+            cb_pathsleader=lambda pathstring, bound: messages.put(('leader', pathstring, bound)),
+            cancel=hymisc.CancelToken(cancel_event),
+            export_tempomap=True,
+            **kwargs
+        )
+    except hymisc.AnalysisCancelled:
+        messages.put(('cancelled',))
+    except Exception as e:
+        messages.put(('error', repr(e)))
+    else:
+        messages.put(('done', hycodec.dumps(record), tempomap))
+
+def init_analysis_worker(cancel_event):
+    """Initializer for a process pool running analyze_chart_task. Setting
+    cancel_event cancels whatever the workers are running."""
+    global _worker_cancel
+    _worker_cancel = hymisc.CancelToken(cancel_event)
+
+def analyze_chart_task(filepath, *args, **kwargs):
+    """Runs analyze_chart (with a tempo map) in a pool worker, returning
+    (record data (see hycodec), tempo map)."""
+    record, tempomap = analyze_chart(
+        filepath, *args, cancel=_worker_cancel, export_tempomap=True, **kwargs
+    )
+    return hycodec.dumps(record), tempomap
 
-    return pather.record
+def chart_parser(filepath):
+    """A parser for the given chart file's format."""
+    if filepath.endswith(".mid"):
+        return hysong.MidiParser()
+    elif filepath.endswith(".chart"):
+        return hysong.ChartParser()
+    else:
+        raise hymisc.ChartFileError(f"Unexpected chart filetype: {filepath}")
 
 def count_chart_chords(filepath):
     # Parse chart file and make a song object
@@ -1,9 +1,16 @@
 import os
+import io
 import pathlib
 import configparser
 import sqlite3
+import threading
+import concurrent.futures
+import multiprocessing
+import queue
 import time
 import json
+import zlib
+from collections import OrderedDict
 
 import pyperclip
 
@@ -13,19 +20,250 @@ import dearpygui.demo as demo
 import hydra.hymisc as hymisc
 import hydra.hyutil as hyutil
 import hydra.hydata as hydata
+import hydra.hycodec as hycodec
 
 from timeit import default_timer as timer
 
 """Song Library (database)"""
 
 
+class HyAppLibrary:
+    """The song library's side of the app's database (the charts table).
+    
+    Uses the database in WAL mode, so reads don't wait on scans and commits
+    don't have to sync the whole database. Scans (which run on the callback
+    thread) write through their own connection, so the render loop's reads
+    only ever see committed rows.
+    
+    The schema version is kept in the database's user_version; older
+    databases are upgraded when opened.
+    
+    Searches use a full-text index (FTS5) of chart names, artists, charters
+    and folders, which triggers keep in sync with the charts table. If this
+    SQLite doesn't have FTS5, searches fall back to LIKE.
+    
+    Pages are found by seeking from the (sort value, id) of a neighboring
+    page's first/last row in an index, so any page is as quick as the first.
+    
+    Sorting by score goes through the record book's summary columns (in the
+    records table), so it only lists charts that have a current record for
+    the chartmode, best first.
+    
+    """
+    SCHEMA_VERSION = 5
+    
+    # Rows inserted at once during a scan
+    BATCH_SIZE = 500
+    
+    COLUMNS = list(hymisc.TABLE_COL_INFO.keys()) + hymisc.TABLE_STAT_COLS
+    
+    SEARCH_COLUMNS = ['name', 'artist', 'charter', 'folder']
+    SORT_LABELS = {k: hymisc.TABLE_COL_INFO[k][1] for k in ['name', 'artist', 'charter', 'folder']} | {'score': "Score"}
+    
+    def __init__(self):
+        self.cxn = sqlite3.connect(hymisc.DBPATH, check_same_thread=False)
+        self.cxn.execute("PRAGMA journal_mode=WAL")
+        self.cxn.execute("PRAGMA synchronous=NORMAL")
+        self._upgrade()
+        self.has_fts = self._init_fts()
+        
+        # For scans: scanned_stats, add_charts, remove_charts and commit
+        self._scancxn = sqlite3.connect(hymisc.DBPATH, check_same_thread=False)
+        
+        # search --> number of matching charts, until the charts change
+        self._counts = {}
+    
+    def _upgrade(self):
+        version = self.cxn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # Charts tables from before this had no stat columns, or didn't exist
+            self.cxn.execute(f"CREATE TABLE IF NOT EXISTS charts({','.join(self.COLUMNS)})")
+            columns = [row[1] for row in self.cxn.execute("PRAGMA table_info(charts)")]
+            for column in hymisc.TABLE_STAT_COLS:
+                if column not in columns:
+                    self.cxn.execute(f"ALTER TABLE charts ADD COLUMN {column}")
+            self.cxn.execute("CREATE UNIQUE INDEX IF NOT EXISTS charts_path ON charts(path)")
+        if version < 2:
+            # An id column, so the search index has stable rowids to point at
+            columns = ','.join(self.COLUMNS)
+            self.cxn.execute(f"CREATE TABLE charts_new({columns}, id INTEGER PRIMARY KEY)")
+            self.cxn.execute(f"INSERT INTO charts_new({columns}) SELECT {columns} FROM charts")
+            self.cxn.execute("DROP TABLE charts")
+            self.cxn.execute("ALTER TABLE charts_new RENAME TO charts")
+            self.cxn.execute("CREATE UNIQUE INDEX charts_path ON charts(path)")
+        if version < 3:
+            # Ties are broken by id so every row has a distinct key to page from
+            for column in ['name', 'artist', 'charter', 'folder']:
+                self.cxn.execute(f"CREATE INDEX IF NOT EXISTS charts_sort_{column} ON charts({column}, id)")
+        if version < 4:
+            # For joining with records
+            self.cxn.execute("CREATE INDEX IF NOT EXISTS charts_hyhash ON charts(hyhash)")
+        if version < 5:
+            # Paging seeks past (value, id), which a NULL value never compares as
+            for column, default in [
+                ('name', "<unknown name>"), ('artist', "<unknown artist>"),
+                ('charter', "<unknown charter>"), ('folder', "")
+            ]:
+                self.cxn.execute(f"UPDATE charts SET {column} = ? WHERE {column} IS NULL", (default,))
+        
+        self.cxn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self.cxn.commit()
+    
+    def _init_fts(self):
+        """Set up the search index if it isn't already. False if FTS5 isn't available."""
+        if self.cxn.execute("SELECT 1 FROM sqlite_master WHERE name = 'charts_fts'").fetchone():
+            return True
+        
+        columns = ','.join(self.SEARCH_COLUMNS)
+        new_values = ','.join(f"new.{c}" for c in self.SEARCH_COLUMNS)
+        old_values = ','.join(f"old.{c}" for c in self.SEARCH_COLUMNS)
+        try:
+            self.cxn.execute(f"CREATE VIRTUAL TABLE charts_fts USING fts5({columns}, content='charts', content_rowid='id')")
+        except sqlite3.OperationalError:
+            return False
+        
+        self.cxn.executescript(f"""
+            CREATE TRIGGER charts_fts_insert AFTER INSERT ON charts BEGIN
+                INSERT INTO charts_fts(rowid, {columns}) VALUES (new.id, {new_values});
+            END;
+            CREATE TRIGGER charts_fts_delete AFTER DELETE ON charts BEGIN
+                INSERT INTO charts_fts(charts_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            END;
+            CREATE TRIGGER charts_fts_update AFTER UPDATE ON charts BEGIN
+                INSERT INTO charts_fts(charts_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO charts_fts(rowid, {columns}) VALUES (new.id, {new_values});
+            END;
+            INSERT INTO charts_fts(charts_fts) VALUES ('rebuild');
+        """)
+        self.cxn.commit()
+        return True
+    
+    def _fts_query(self, search):
+        """Every word in the search has to start a word in one of the columns."""
+        return ' '.join('"' + word.replace('"', '""') + '"*' for word in search.split())
+    
+    def _where(self, search, conditions, params, use_fts=True):
+        if search:
+            if self.has_fts and use_fts:
+                conditions = ["charts.id IN (SELECT rowid FROM charts_fts WHERE charts_fts MATCH ?)", *conditions]
+                params = (self._fts_query(search),) + params
+            else:
+                searchparam = f"%{search}%"
+                conditions = ["(charts.name LIKE ? OR charts.artist LIKE ?)", *conditions]
+                params = (searchparam, searchparam) + params
+        return ("WHERE " + " AND ".join(conditions) if conditions else ""), params
+    
+    def _query(self, sql, search, conditions=(), params=()):
+        """Runs a query with the WHERE clause (the search's and any other
+        conditions) filled in. Searches that the index can't take (like only
+        punctuation) use LIKE instead."""
+        try:
+            where, allparams = self._where(search, conditions, params)
+            return self.cxn.execute(sql.format(where=where), allparams)
+        except sqlite3.OperationalError:
+            if not (search and self.has_fts):
+                raise
+            where, allparams = self._where(search, conditions, params, use_fts=False)
+            return self.cxn.execute(sql.format(where=where), allparams)
+    
+    def _source(self, sort, chartmode):
+        """(FROM clause, conditions, their params, sort expression, whether
+        it sorts descending) for the sort."""
+        if sort == 'score':
+            return (
+                "charts JOIN records ON records.hyhash = charts.hyhash",
+                ["records.chartmode = ?", "records.compatible = 1"], (chartmode,),
+                "records.best_score", True
+            )
+        if sort not in self.SORT_LABELS:
+            raise ValueError(f"Can't sort by {sort}")
+        return "charts", [], (), sort, False
+    
+    def count(self, search=None, sort=None, chartmode=None):
+        """Number of charts (that match the search, if there is one) that the
+        sort lists."""
+        if sort == 'score':
+            # Depends on the records too, so it isn't cached
+            source, conditions, params, _, _ = self._source(sort, chartmode)
+            return self._query(f"SELECT COUNT(*) FROM {source} {{where}}", search, conditions, params).fetchone()[0]
+        
+        # A scan's commit replaces the dict, so a count from before then
+        # doesn't end up in the new one
+        counts = self._counts
+        if search not in counts:
+            counts[search] = self._query("SELECT COUNT(*) FROM charts {where}", search).fetchone()[0]
+        return counts[search]
+    
+    def row_key(self, row, sort):
+        """Where a row is in the given sort order, for paging from it."""
+        if sort == 'score':
+            return (row[len(self.COLUMNS) + 1], row[len(self.COLUMNS)])
+        return (row[hymisc.TABLE_COL_INFO[sort][0]], row[len(self.COLUMNS)])
+    
+    def page(self, search, sort, limit, at=None, after=None, before=None, chartmode=None):
+        """Rows of the charts that match the search, in the sort's order. The
+        page starts at (or just after) the given row key, or ends just before
+        it. No key is the first page.
+        
+        Sorting by score needs the chartmode, and rows have the score added
+        on the end.
+        """
+        source, conditions, params, sortexpr, descending = self._source(sort, chartmode)
+        columns = "charts.*, records.best_score" if sort == 'score' else "charts.*"
+        
+        # Paging backwards is paging forwards in the opposite order
+        backwards = bool(before)
+        if descending != backwards:
+            order, ops = "DESC", {'at': "<=", 'after': "<", 'before': "<"}
+        else:
+            order, ops = "", {'at': ">=", 'after': ">", 'before': ">"}
+        
+        for seek, key in [('at', at), ('after', after), ('before', before)]:
+            if key:
+                conditions = conditions + [f"({sortexpr}, charts.id) {ops[seek]} (?, ?)"]
+                params = params + tuple(key)
+        
+        rows = self._query(
+            f"SELECT {columns} FROM {source} {{where}} ORDER BY {sortexpr} {order}, charts.id {order} LIMIT ?",
+            search, conditions, params + (limit,)
+        ).fetchall()
+        return rows[::-1] if backwards else rows
+    
+    def scanned_stats(self):
+        """path --> (folder, stats...) from the last scan."""
+        return {
+            row[0]: row[1:]
+            for row in self._scancxn.execute(f"SELECT path, folder, {','.join(hymisc.TABLE_STAT_COLS)} FROM charts")
+        }
+    
+    def add_charts(self, rows):
+        """Adds or updates charts (matched by path). Uncommitted."""
+        # An upsert rather than a REPLACE, which wouldn't fire the delete trigger
+        self._scancxn.executemany(
+            f"INSERT INTO charts({','.join(self.COLUMNS)}) VALUES ({','.join('?' * len(self.COLUMNS))}) "
+            f"ON CONFLICT(path) DO UPDATE SET {','.join(f'{c} = excluded.{c}' for c in self.COLUMNS)}",
+            rows
+        )
+    
+    def remove_charts(self, paths):
+        """Uncommitted."""
+        self._scancxn.executemany("DELETE FROM charts WHERE path = ?", [(path,) for path in paths])
+    
+    def commit(self):
+        self._scancxn.commit()
+        self._counts = {}
+
+
 def scan_library():
     """Makes a database out of the charts found in the given root folder.
     
-    Replaces the current one if it's already there.
+    Updates the current one if it's already there: only charts that are new
+    or changed (by file size/mtime) are read again, and charts that are gone
+    are removed.
     
     """
     errors = []
+    library = appstate.library
     
     # Map out the file locations first
     chartfiles, folder_errors = hyutil.discover_charts(
@@ -35,32 +273,131 @@ def scan_library():
     errors += folder_errors
     on_scan_findcomplete(len(chartfiles))
     
-    cxn = sqlite3.connect(hymisc.DBPATH)
-    cur = cxn.cursor()
+    scanned = library.scanned_stats()
+    
+    def read_chart(info):
+        """(path, row values), where there are no row values if nothing changed."""
+        chartfile, inifile, path, subfolders = info
+        stats = hyutil.get_filestats(chartfile, inifile)
+        if scanned.get(path) == (subfolders,) + stats:
+            return path, None
+        return path, hyutil.get_rowvalues(*info) + stats
+    
+    # Copy info from each new/changed ini to the db. Hashing charts and
+    # reading inis is spread over threads, and rows are inserted in batches
+    found = set()
+    rows = []
+    with concurrent.futures.ThreadPoolExecutor() as pool:
+        futures = [pool.submit(read_chart, info) for info in chartfiles]
+        for i, future in enumerate(concurrent.futures.as_completed(futures)):
+            try:
+                path, rowvalues = future.result()
+            except Exception as e:
+                errors.append(str(e))
+            else:
+                found.add(path)
+                if rowvalues:
+                    rows.append(rowvalues)
+                if len(rows) >= library.BATCH_SIZE:
+                    library.add_charts(rows)
+                    rows = []
+            on_scan_db_progress(i+1, len(chartfiles))
+    library.add_charts(rows)
+    
+    # Charts that are gone (or broken now)
+    library.remove_charts([path for path in scanned if path not in found])
+    library.commit()
     
-    # Initialize db
-    chartrow = ','.join(hymisc.TABLE_COL_INFO.keys())
-    cur.execute("DROP TABLE IF EXISTS charts")
-    cur.execute(f"CREATE TABLE charts({chartrow})")
+    return len(chartfiles), errors
     
-    # Copy info from each ini to the db
-    for i, info in enumerate(chartfiles):
-        try:
-            # Insert into db
-            rowvalues = hyutil.get_rowvalues(*info)
-            cur.execute(
-                f"INSERT INTO charts VALUES (?, ?, ?, ?, ?, ?)",
-                rowvalues
-            )
-        except Exception as e:
-            errors.append(str(e))
-        on_scan_db_progress(i+1, len(chartfiles))
-        
-    cxn.commit()
-    cxn.close()
+
+"""Saving"""
+
+
+def write_file_atomic(path, text):
+    """Writes to a temp file next to the real one and then swaps it in, so
+    the file is never left half-written."""
+    tmppath = path.with_name(path.name + ".tmp")
+    with open(tmppath, 'w') as tmpfile:
+        tmpfile.write(text)
+        tmpfile.flush()
+        os.fsync(tmpfile.fileno())
+    os.replace(tmppath, path)
+
+
+class HyAppWriter:
+    """Does the app's saving on a background thread, so the UI never waits
+    on the disk.
     
-    return len(chartfiles), errors
+    Jobs are keyed by what they save. Scheduling a job replaces any pending
+    job with the same key, and jobs only run once nothing has been scheduled
+    for DEBOUNCE seconds (so typing in a setting saves once, at the end), or
+    once the oldest has waited MAX_DELAY seconds (so a steady stream of jobs,
+    like a batch analysis' records, still gets saved as it goes).
+    
+    """
+    DEBOUNCE = 0.5
+    MAX_DELAY = 5
     
+    def __init__(self):
+        self._jobs = {}
+        self._due = None
+        # When the pending jobs started waiting
+        self._since = None
+        # Counts finished rounds of jobs, so the UI can tell when things were saved
+        self.saves = 0
+        self._running = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="HyAppWriter", daemon=True)
+        self._thread.start()
+    
+    def schedule(self, key, job):
+        with self._cond:
+            now = time.monotonic()
+            if not self._jobs:
+                self._since = now
+            self._jobs[key] = job
+            self._due = min(now + self.DEBOUNCE, self._since + self.MAX_DELAY)
+            self._cond.notify()
+    
+    def flush(self):
+        """Run pending jobs now and wait for them to finish."""
+        with self._cond:
+            self._due = 0
+            self._cond.notify()
+            while self._jobs or self._running:
+                self._cond.wait()
+    
+    def close(self):
+        """Flush and stop the thread. Call on shutdown."""
+        with self._cond:
+            self._closed = True
+        self.flush()
+        self._thread.join()
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._jobs or time.monotonic() < self._due:
+                    if self._closed and not self._jobs:
+                        return
+                    self._cond.wait(None if not self._jobs else self._due - time.monotonic())
+                jobs = list(self._jobs.values())
+                self._jobs.clear()
+                self._running = True
+            
+            for job in jobs:
+                try:
+                    job()
+                except Exception as e:
+                    print(f"Couldn't save: {e!r}")
+            
+            with self._cond:
+                self._running = False
+                self.saves += 1
+                self._cond.notify_all()
+
 
 """Settings"""
 
@@ -119,8 +456,15 @@ class HyAppUserSettings:
     depth_mode = HyAppUserSetting()
     mslimit_enabled = HyAppUserSetting(astype='bool')
     mslimit_value = HyAppUserSetting()
-    
-    def __init__(self):
+    calibration = HyAppUserSetting()
+    calibration_sweep = HyAppUserSetting(astype='bool')
+    library_sort = HyAppUserSetting()
+    batch_workers = HyAppUserSetting()
+    batch_paused = HyAppUserSetting(astype='bool')
+    
+    def __init__(self, writer):
+        self.writer = writer
+        
         # Load setting values from config
         self.cfg = configparser.ConfigParser()
         try:
@@ -148,7 +492,12 @@ class HyAppUserSettings:
             ('depth_value', '4'),
             ('depth_mode', 'scores'),
             ('mslimit_enabled', 'True'),
-            ('mslimit_value', '10')
+            ('mslimit_value', '10'),
+            ('calibration', '0'),
+            ('calibration_sweep', 'False'),
+            ('library_sort', 'name'),
+            ('batch_workers', str(max(1, (os.cpu_count() or 2) // 2))),
+            ('batch_paused', 'False')
         ]:
             if key not in loadedsettings:
                 loadedsettings[key] = default
@@ -164,68 +513,225 @@ class HyAppUserSettings:
         self.chartfolders = [f for f in self.chartfolders if f != folder]
 
     def savecfg(self):
-        with open(hymisc.INIPATH, 'w') as cfgfile:
-            self.cfg.write(cfgfile)
+        # Write out the text now, so the writer doesn't see later changes halfway in
+        cfgtext = io.StringIO()
+        self.cfg.write(cfgtext)
+        self.writer.schedule('cfg', lambda: write_file_atomic(hymisc.INIPATH, cfgtext.getvalue()))
             
+    def ms_limit(self):
+        """The ms limit for viewing paths, or None if it's turned off."""
+        return int(self.mslimit_value) if self.mslimit_enabled else None
+    
+    def calibration_ms(self):
+        return int(self.calibration)
+    
+    @staticmethod
+    def chartmode_options(key):
+        """(difficulty, prodrums, bass2x) of a chartmode_key."""
+        difficulty, modes = key.split(" ", 1)
+        prodrums, bass = modes.split(", ")
+        return difficulty, prodrums == "Pro Drums", bass == "2x Bass"
+    
     def chartmode_key(self):
         """A combined string to match up values of (difficulty, prodrums, bass2x)"""
         prodrums = "Pro Drums" if appstate.usettings.view_prodrums else "Drums"
         bass = "2x Bass" if appstate.usettings.view_bass2x else "1x Bass"
         return f"{appstate.usettings.view_difficulty} {prodrums}, {bass}"
 
+class HyAppRecordSummary:
+    """The parts of a record that the library shows (or sorts/filters by),
+    which are saved alongside the record so that it doesn't have to be
+    loaded for them.
+    
+    The best path is the one shown at the record's own calibration (see
+    HydraRecord.best_view_path), like the song details show it.
+    
+    activations: Number of activations in the best path.
+    hardest_ms: The best path's hardest squeeze/calibration timing (see
+    Path.difficulty), or None if it has no timing requirements.
+    """
+    def __init__(self, hyversion, best_path, best_score, activations, hardest_ms):
+        self.hyversion = hyversion
+        self.best_path = best_path
+        self.best_score = best_score
+        self.activations = activations
+        self.hardest_ms = hardest_ms
+    
+    @classmethod
+    def of(cls, record):
+        path = record.best_view_path() if record.is_version_compatible() else None
+        if path is not None:
+            return cls(record.hyversion, path.pathstring(), path.totalscore(), len(path), path.difficulty())
+        return cls(record.hyversion, None, None, None, None)
+    
+    def row(self):
+        """Values for the records table's summary columns."""
+        return (
+            json.dumps(self.hyversion), self.best_path, self.best_score, self.activations, self.hardest_ms,
+            self.is_version_compatible()
+        )
+    
+    def is_version_compatible(self):
+        return self.hyversion == hymisc.HYDRA_VERSION
+
+
 class HyAppRecordBook:
     """Code-accessible collection of records that have been generated.
     
-    Is saved and loaded much like usersettings.
+    Saved in the app's database, next to the song library:
+    songs: hyhash --> ref values and the tempo map (for record timecodes).
+    records: (hyhash, chartmode_key) --> binary record data (see hycodec) and
+    the record's summary values.
     
-    Top level organization is by hyhash.
-    In each hyhash are ref values and a 'records' map of
-    chartmode_key: hydata.
+    Saving a record only writes its own row, and that happens in the
+    background (see HyAppWriter); records are kept in memory until they're
+    written. Only the summaries are read on startup; full records are loaded
+    when they're asked for, and the most recent few are kept around.
     
     hyhash: Hash of the chart file. Not comparable to other apps' song hashes.
     
     """
-    def __init__(self):
-        """Load existing records from file or initialize it"""
-        # Initialize
-        self.book = {}
+    RECORD_CACHE_SIZE = 32
+    
+    # Summary columns in the records table (hyversion is json)
+    SUMMARY_COLUMNS = ['hyversion', 'best_path', 'best_score', 'activations', 'hardest_ms', 'compatible']
+    
+    def __init__(self, writer):
+        """Open the records tables or initialize them"""
+        self.writer = writer
+        # Only used by the writer's thread
+        self._writecxn = None
         
-        try:
-            # Import from save file
-            with open(hymisc.BOOKPATH, 'r') as jsonfile:
-                print(f"Loading json:")
-                starttime = timer()
-                self.book = json.load(jsonfile, object_hook=hydata.json_load)
-                self._init_timecodes()
-                endtime = timer()
-                print(f"\tTook {endtime - starttime:.6f} seconds.")
-                if self.book is None:
-                    self.book = {}
-        except FileNotFoundError:
-            self.book = {}
+        self.cxn = sqlite3.connect(hymisc.DBPATH, check_same_thread=False)
+        self.cxn.execute("CREATE TABLE IF NOT EXISTS songs(hyhash TEXT PRIMARY KEY, name, artist, charter, tempomap)")
+        self.cxn.execute("CREATE TABLE IF NOT EXISTS records(hyhash TEXT, chartmode TEXT, record BLOB, PRIMARY KEY (hyhash, chartmode))")
+        
+        columns = [row[1] for row in self.cxn.execute("PRAGMA table_info(records)")]
+        for column in self.SUMMARY_COLUMNS:
+            if column not in columns:
+                self.cxn.execute(f"ALTER TABLE records ADD COLUMN {column}")
+        # For sorting the library by score
+        self.cxn.execute("CREATE INDEX IF NOT EXISTS records_score ON records(chartmode, compatible, best_score)")
+        self.cxn.commit()
+        
+        # Loaded records (most recently used last), tempo maps and summaries
+        self._records = OrderedDict()
+        self._tempomaps = {}
+        self._summaries = {}
+        # Records that the writer hasn't saved yet
+        self._unsaved = {}
+        
+        # Records used to be saved all together in a json file
+        if os.path.exists(hymisc.BOOKPATH):
+            self._import_json()
+        
+        self._init_summaries()
+    
+    def _import_json(self):
+        """Move records from the old records.json into the database.
+        
+        The json file is kept as a backup but renamed, so this only happens once.
         
-        # Resave / create save file
-        self.savejson()
+        """
+        print(f"Importing json:")
+        starttime = timer()
+        with open(hymisc.BOOKPATH, 'r') as jsonfile:
+            book = json.load(jsonfile, object_hook=hydata.json_load)
+        
+        for hyhash, info in (book or {}).items():
+            self.cxn.execute(
+                "INSERT OR IGNORE INTO songs VALUES (?, ?, ?, ?, ?)",
+                (hyhash, info['ref_name'], info['ref_artist'], info['ref_charter'], json.dumps(info['tempomap']))
+            )
+            for chartmode, record in info['records'].items():
+                self._save_record(self.cxn, hyhash, chartmode, record)
+        self.cxn.commit()
+        
+        os.replace(hymisc.BOOKPATH, hymisc.BOOKPATH.with_suffix(".json.bak"))
+        endtime = timer()
+        print(f"\tTook {endtime - starttime:.6f} seconds.")
+    
+    def _init_summaries(self):
+        """Read every record's summary, filling in any that are missing."""
+        assignments = ', '.join(f"{column} = ?" for column in self.SUMMARY_COLUMNS)
+        for hyhash, chartmode, blob in self.cxn.execute(
+            "SELECT hyhash, chartmode, record FROM records WHERE hyversion IS NULL OR (best_path IS NOT NULL AND activations IS NULL)"
+        ).fetchall():
+            summary = HyAppRecordSummary.of(self._decode(blob))
+            self.cxn.execute(
+                f"UPDATE records SET {assignments} WHERE hyhash = ? AND chartmode = ?",
+                summary.row() + (hyhash, chartmode)
+            )
+        
+        # Whether a record is compatible changes with the app's version (only
+        # rewrite the rows where it did, so startup doesn't touch every row)
+        hyversion = json.dumps(hymisc.HYDRA_VERSION)
+        self.cxn.execute(
+            "UPDATE records SET compatible = (hyversion = ?) WHERE compatible IS NOT (hyversion = ?)",
+            (hyversion, hyversion)
+        )
+        self.cxn.commit()
+        
+        self._summaries = {
+            (hyhash, chartmode): HyAppRecordSummary(tuple(json.loads(hyversion)), best_path, best_score, activations, hardest_ms)
+            for hyhash, chartmode, hyversion, best_path, best_score, activations, hardest_ms in self.cxn.execute(
+                "SELECT hyhash, chartmode, hyversion, best_path, best_score, activations, hardest_ms FROM records"
+            )
+        }
     
-    def _init_timecodes(self):
+    def _decode(self, blob):
+        if hycodec.is_record_data(blob):
+            return hycodec.loads(blob)
+        
+        # Saved before records were binary
+        return json.loads(zlib.decompress(blob), object_hook=hydata.json_load)
+    
+    def read_options(self, data):
+        """(depth_mode, depth_value) and analysis options (see
+        analysis_kwargs) that a record was analyzed with, or None if its data
+        doesn't say (like records from before the binary format)."""
+        if hycodec.is_record_data(data):
+            record = hycodec.loads_header(data)
+            if record.depth_mode is not None:
+                e_low, e_high = record.e_sweep if record.e_sweep else (None, None)
+                return (
+                    record.depth_mode, record.depth_value,
+                    record.ms_limit, record.ms_frontier, e_low, e_high
+                )
+        return None
+    
+    def read_record(self, data, tempomap):
+        """A record from its data (see hycodec), ready to view with the given
+        tempo map."""
+        record = self._decode(data)
+        if record.is_version_compatible():
+            self._init_timecodes(record, tempomap)
+        return record
+    
+    def _init_timecodes(self, record, tempomap):
         """Replaces loaded timecode values (tick only) with full Timecodes."""
-        for info in self.book.values():
-            # Same tick? Just reuse the timecode instead of remaking
-            made_timecodes = {}
-            tempomap = (info['tempomap']['res'], info['tempomap']['tpm'], info['tempomap']['bpm'])
-            for record in info['records'].values():
-                for path in record.all_paths():
-                    for act in path._activations:
-                        if act.timecode not in made_timecodes:
-                            new_tc = hymisc.Timecode(act.timecode, *tempomap)
-                            made_timecodes[act.timecode] = new_tc
-                        act.timecode = made_timecodes[act.timecode]
-                        
-                        for bsq in act.backends:
-                            if bsq.timecode not in made_timecodes:
-                                new_tc = hymisc.Timecode(bsq.timecode, *tempomap)
-                                made_timecodes[bsq.timecode] = new_tc
-                            bsq.timecode = made_timecodes[bsq.timecode]
+        # Same tick? Just reuse the timecode instead of remaking
+        made_timecodes = {}
+        tempomap = (tempomap['res'], tempomap['tpm'], tempomap['bpm'])
+        def timecode(tc):
+            # Activations/backends can be shared between paths, so some are already done
+            if not isinstance(tc, int):
+                return tc
+            if tc not in made_timecodes:
+                made_timecodes[tc] = hymisc.Timecode(tc, *tempomap)
+            return made_timecodes[tc]
+        
+        for path in record.all_paths():
+            for act in path._activations:
+                act.timecode = timecode(act.timecode)
+                for bsq in act.backends:
+                    bsq.timecode = timecode(bsq.timecode)
+    
+    def _tempomap(self, hyhash):
+        if hyhash not in self._tempomaps:
+            row = self.cxn.execute("SELECT tempomap FROM songs WHERE hyhash = ?", (hyhash,)).fetchone()
+            self._tempomaps[hyhash] = json.loads(row[0], object_hook=hydata.json_load)
+        return self._tempomaps[hyhash]
     
     def add_song(self, hyhash, name, artist, charter, tempomap):
         """Add an entry for the given hash.
@@ -234,24 +740,16 @@ class HyAppRecordBook:
         and therefore which metadata is added with the hyhash can depend on
         which gets processed first, but realistically if the hyhash is the same
         then title/artist/charter will be the same. Anyway, they're just
-        reference values in case you're searching through the json manually.
+        reference values in case you're searching through the database manually.
         
         """
-        if hyhash in self.book:
-            return
-        
-        self.book[hyhash] = {
-            # Some metadata for convenience if digging through the json
-            'ref_name': name,
-            'ref_artist': artist,
-            'ref_charter': charter,
-            
-            'tempomap': tempomap,
-            
-            'records': {},
-        }
+        row = (hyhash, name, artist, charter, json.dumps(tempomap))
+        def write_song():
+            cxn = self._writer_cxn()
+            cxn.execute("INSERT OR IGNORE INTO songs VALUES (?, ?, ?, ?, ?)", row)
+            cxn.commit()
         
-        self.savejson()
+        self.writer.schedule(('song', hyhash), write_song)
         
     def add_record(self, hyhash, chartmode, record):
         """Adds a record in the given place.
@@ -259,28 +757,446 @@ class HyAppRecordBook:
         Requires the song to have been added beforehand.
         
         """
-        self.book[hyhash]['records'][chartmode] = record
+        key = (hyhash, chartmode)
+        self._unsaved[key] = record
+        self._summaries[key] = HyAppRecordSummary.of(record)
+        self._cache_record(key, record)
         
-        self.savejson()
+        def write_record():
+            cxn = self._writer_cxn()
+            self._save_record(cxn, hyhash, chartmode, record)
+            cxn.commit()
+            # Unless it was replaced in the meantime
+            if self._unsaved.get(key) is record:
+                del self._unsaved[key]
         
-    def savejson(self):
-        """Save current state to json file."""
-        print(f"save json:")
-        starttime = timer()
-        with open(hymisc.BOOKPATH, 'w') as jsonfile:
-            json.dump(self.book, jsonfile, default=hydata.json_save, separators=(',', ':'))
-        endtime = timer()
-        print(f"\tTook {endtime - starttime:.6f} seconds.")
+        self.writer.schedule(('record', hyhash, chartmode), write_record)
+    
+    def _writer_cxn(self):
+        if self._writecxn is None:
+            self._writecxn = sqlite3.connect(hymisc.DBPATH)
+        return self._writecxn
+    
+    def _save_record(self, cxn, hyhash, chartmode, record):
+        columns = ['hyhash', 'chartmode', 'record'] + self.SUMMARY_COLUMNS
+        cxn.execute(
+            f"INSERT OR REPLACE INTO records({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            (hyhash, chartmode, hycodec.dumps(record)) + HyAppRecordSummary.of(record).row()
+        )
+    
+    def get_summary(self, hyhash, chartmode):
+        """The summary of the record in the given place, or None if there
+        isn't one. Doesn't load the record."""
+        return self._summaries.get((hyhash, chartmode))
+    
+    def get_record(self, hyhash, chartmode):
+        """The record in the given place, or None if there isn't one."""
+        key = (hyhash, chartmode)
+        if key in self._records:
+            self._records.move_to_end(key)
+            return self._records[key]
+        
+        record = self._unsaved.get(key)
+        if record is not None:
+            self._cache_record(key, record)
+            return record
+        
+        if key not in self._summaries:
+            return None
+        
+        row = self.cxn.execute(
+            "SELECT record FROM records WHERE hyhash = ? AND chartmode = ?", key
+        ).fetchone()
+        record = self._decode(row[0])
+        if record.is_version_compatible():
+            self._init_timecodes(record, self._tempomap(hyhash))
+        
+        self._cache_record(key, record)
+        return record
+    
+    def _cache_record(self, key, record):
+        self._records[key] = record
+        self._records.move_to_end(key)
+        while len(self._records) > self.RECORD_CACHE_SIZE:
+            self._records.popitem(last=False)
  
+def analysis_kwargs(options):
+    """analyze_chart keyword arguments for analysis options (ms_limit,
+    ms_frontier, e_low, e_high), where e_low is None without a sweep."""
+    ms_limit, ms_frontier, e_low, e_high = options
+    return {
+        'ms_filter': ms_limit,
+        'ms_frontier': bool(ms_frontier),
+        'e_sweep': None if e_low is None else (e_low, e_high)
+    }
+
+class HyAppAnalysis:
+    """Analysis of one song in its own process, so the UI keeps running.
+    
+    The process reports through a queue (see hyutil.analyze_chart_job),
+    which the render loop reads with messages().
+    
+    """
+    # How long to wait for a last message from a process that's exited
+    EXIT_TIMEOUT = 0.1
+    
+    def __init__(self, song_row, chartmode, chartfile, *args, **kwargs):
+        # The song and view options it was started with
+        self.song_row = song_row
+        self.chartmode = chartmode
+        self.key = (song_row[0], chartmode)
+        
+        # Set when it's done, cancelled or failed
+        self.finished = False
+        self.error = None
+        
+        # Spawned, so the process doesn't copy the UI's state
+        context = multiprocessing.get_context('spawn')
+        self._messages = context.Queue()
+        self._cancel = context.Event()
+        self.process = context.Process(
+            target=hyutil.analyze_chart_job,
+            args=(self._messages, self._cancel, chartfile) + args,
+            kwargs=kwargs,
+            daemon=True
+        )
+        self.process.start()
+    
+    def cancel(self):
+        self._cancel.set()
+    
+    def messages(self):
+        """Messages from the process since the last call, without waiting.
+        
+        If the process died without finishing, that's reported as an error.
+        
+        """
+        if self.finished:
+            return []
+        
+        is_alive = self.process.is_alive()
+        result = []
+        while True:
+            try:
+                result.append(self._messages.get_nowait())
+            except queue.Empty:
+                break
+        
+        if result and result[-1][0] in ('done', 'cancelled', 'error'):
+            self.finished = True
+        elif not is_alive:
+            # Anything it posted before exiting is already on its way
+            try:
+                while True:
+                    result.append(self._messages.get(timeout=self.EXIT_TIMEOUT))
+                    if result[-1][0] in ('done', 'cancelled', 'error'):
+                        break
+            except queue.Empty:
+                result.append(('error', f"Analysis process exited unexpectedly (exit code {self.process.exitcode})"))
+            self.finished = True
+        
+        if self.finished:
+            self.process.join()
+            if result[-1][0] == 'error':
+                self.error = result[-1][1]
+        return result
+    
+
+class HyAppBatch:
+    """A queue of songs to analyze in the background, worked through by a
+    pool of processes (see hyutil.analyze_chart_task).
+    
+    The queue is kept in the app's database (the batch table), so it picks
+    back up after a restart. Jobs go by priority, then in the order they
+    were queued, except that jobs for the rows on screen go first.
+    
+    Jobs are taken off the queue as they finish, and poll() hands back their
+    results so their records can be saved one at a time.
+    
+    The pool has a worker per CPU, and the workers setting is how many jobs
+    are given to it at once, so that can change without restarting jobs.
+    
+    If a worker dies (which breaks the pool), there's no telling which job
+    it was running, so the jobs that were in the pool are queued again and
+    each is run on its own from then on. A job only fails for crashing when
+    it crashes on its own.
+    
+    """
+    PRIORITY_LOW = 0
+    PRIORITY_NORMAL = 1
+    
+    # Job columns, after hyhash and chartmode: the song (for the record
+    # book), where it is, and the analysis options (see analysis_kwargs)
+    COLUMNS = [
+        'hyhash', 'chartmode', 'name', 'artist', 'charter', 'path',
+        'difficulty', 'prodrums', 'bass2x', 'depth_mode', 'depth_value',
+        'ms_limit', 'ms_frontier', 'e_low', 'e_high'
+    ]
+    
+    def __init__(self, workers):
+        self.workers = workers
+        self.paused = False
+        # Keys (hyhash, chartmode) of the jobs on screen
+        self.visible = set()
+        # Jobs that failed since the app started: (job, description)
+        self.failed = []
+        
+        self._lock = threading.RLock()
+        self._pool = None
+        self._cancel = None
+        # Future --> job
+        self._running = {}
+        # Keys of jobs that were running when a worker died, and the future
+        # of the one of them that's running (on its own), if any
+        self._suspects = set()
+        self._isolated = None
+        
+        self.cxn = sqlite3.connect(hymisc.DBPATH, check_same_thread=False)
+        self.cxn.execute(
+            f"CREATE TABLE IF NOT EXISTS batch({', '.join(self.COLUMNS)}, priority INTEGER, id INTEGER PRIMARY KEY, "
+            "UNIQUE (hyhash, chartmode))"
+        )
+        # Queues from before these options were kept get plain analysis
+        columns = [row[1] for row in self.cxn.execute("PRAGMA table_info(batch)")]
+        for column in self.COLUMNS:
+            if column not in columns:
+                self.cxn.execute(f"ALTER TABLE batch ADD COLUMN {column}")
+        self.cxn.execute("CREATE INDEX IF NOT EXISTS batch_order ON batch(priority DESC, id)")
+        self.cxn.commit()
+        self._size = self.cxn.execute("SELECT COUNT(*) FROM batch").fetchone()[0]
+    
+    def __len__(self):
+        """Number of jobs queued, including those running."""
+        return self._size
+    
+    def running(self):
+        return len(self._running)
+    
+    def add(self, jobs, priority=PRIORITY_NORMAL):
+        """Queues job rows (values for COLUMNS). Songs that are already queued
+        get the new options and priority, unless they're already queued at a
+        higher priority."""
+        updates = ', '.join(f"{c} = excluded.{c}" for c in self.COLUMNS[2:])
+        with self._lock:
+            self.cxn.executemany(
+                f"INSERT INTO batch({', '.join(self.COLUMNS)}, priority) VALUES ({', '.join('?' * (len(self.COLUMNS) + 1))}) "
+                f"ON CONFLICT(hyhash, chartmode) DO UPDATE SET {updates}, priority = excluded.priority "
+                "WHERE excluded.priority >= batch.priority",
+                [tuple(job) + (priority,) for job in jobs]
+            )
+            self.cxn.commit()
+            self._size = self.cxn.execute("SELECT COUNT(*) FROM batch").fetchone()[0]
+    
+    def remove(self, hyhash, chartmode):
+        """Takes a job off the queue (it still finishes if it's running)."""
+        with self._lock:
+            self.cxn.execute("DELETE FROM batch WHERE hyhash = ? AND chartmode = ?", (hyhash, chartmode))
+            self.cxn.commit()
+            self._size = self.cxn.execute("SELECT COUNT(*) FROM batch").fetchone()[0]
+    
+    def clear(self):
+        """Cancels running jobs and empties the queue."""
+        with self._lock:
+            self._stop()
+            self.cxn.execute("DELETE FROM batch")
+            self.cxn.commit()
+            self._size = 0
+    
+    def set_paused(self, paused):
+        """Pausing cancels running jobs, which stay queued."""
+        with self._lock:
+            self.paused = paused
+            if paused:
+                self._stop()
+    
+    def set_workers(self, workers):
+        """Running jobs carry on; the new count applies as jobs start."""
+        with self._lock:
+            self.workers = workers
+    
+    def close(self):
+        """Cancels running jobs and waits for the workers. Call on shutdown."""
+        with self._lock:
+            self._stop(wait=True)
+    
+    def poll(self):
+        """Jobs that finished since the last poll, as (job, result) where result
+        is (record data, tempo map), or None if the job failed. Also starts
+        queued jobs on any free workers."""
+        with self._lock:
+            finished = []
+            broken = False
+            for future, job in list(self._running.items()):
+                if not future.done():
+                    continue
+                try:
+                    result = future.result()
+                except concurrent.futures.BrokenExecutor:
+                    broken = True
+                    continue
+                except hymisc.AnalysisCancelled:
+                    del self._running[future]
+                    continue
+                except Exception as e:
+                    self.failed.append((job, repr(e)))
+                    result = None
+                
+                del self._running[future]
+                if future is self._isolated:
+                    self._isolated = None
+                    self._suspects.discard((job[0], job[1]))
+                self.remove(job[0], job[1])
+                finished.append((job, result))
+            
+            if broken:
+                finished += self._recover()
+            
+            if not self.paused:
+                self._fill()
+            return finished
+    
+    def _recover(self):
+        """After a worker died: every job that was in the pool has failed.
+        Queues them again to be run on their own, except the job that was
+        already on its own (which must have crashed it)."""
+        finished = []
+        for future, job in self._running.items():
+            key = (job[0], job[1])
+            if future is self._isolated:
+                self.failed.append((job, "Analysis crashed."))
+                self._suspects.discard(key)
+                self.remove(*key)
+                finished.append((job, None))
+            else:
+                self._suspects.add(key)
+        
+        self._running.clear()
+        self._isolated = None
+        self._pool.shutdown(wait=False)
+        self._pool = None
+        return finished
+    
+    def _fill(self):
+        """Starts the next jobs, if there are any and free workers for them."""
+        if self._isolated is not None:
+            return
+        free = self.workers - len(self._running)
+        if free <= 0 or self._size <= len(self._running):
+            if not self._running and self._pool:
+                # Nothing left to do
+                self._stop()
+            return
+        
+        running = {(job[0], job[1]) for job in self._running.values()}
+        for job in self._next_jobs(free + len(running)):
+            if free == 0:
+                break
+            if (job[0], job[1]) in running:
+                continue
+            
+            try:
+                chartfile = hyutil.get_folder_chart(job[5])
+            except OSError:
+                chartfile = None
+            if chartfile is None:
+                self.failed.append((job, "Song file not found."))
+                self.remove(job[0], job[1])
+                continue
+            
+            is_suspect = (job[0], job[1]) in self._suspects
+            if is_suspect and self._running:
+                # Wait for the others to finish, so it runs on its own
+                break
+            
+            if self._pool is None:
+                self._cancel = multiprocessing.get_context('spawn').Event()
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max(self.workers, os.cpu_count() or 1), mp_context=multiprocessing.get_context('spawn'),
+                    initializer=hyutil.init_analysis_worker, initargs=(self._cancel,)
+                )
+            future = self._pool.submit(
+                hyutil.analyze_chart_task, chartfile, *job[6:11], **analysis_kwargs(job[11:15])
+            )
+            self._running[future] = job
+            if is_suspect:
+                self._isolated = future
+                break
+            running.add((job[0], job[1]))
+            free -= 1
+    
+    def _next_jobs(self, count):
+        """Up to count jobs from the front of the queue, after the visible ones."""
+        columns = ', '.join(self.COLUMNS)
+        jobs = []
+        for hyhash, chartmode in self.visible:
+            jobs += self.cxn.execute(
+                f"SELECT {columns} FROM batch WHERE hyhash = ? AND chartmode = ?", (hyhash, chartmode)
+            ).fetchall()
+        return jobs + self.cxn.execute(
+            f"SELECT {columns} FROM batch ORDER BY priority DESC, id LIMIT ?", (count,)
+        ).fetchall()
+    
+    def _stop(self, wait=False):
+        if self._pool:
+            self._cancel.set()
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+        self._running.clear()
+        self._isolated = None
+    
+
+def queue_outdated_records():
+    """Queues records from other versions of Hydra to be analyzed again, at
+    a low priority, with the options they were analyzed with.
+    
+    Only records whose charts are still in the library (and still there)
+    are queued. Reading them takes a while, so this runs on its own thread.
+    
+    """
+    cxn = sqlite3.connect(hymisc.DBPATH)
+    jobs = []
+    for hyhash, chartmode, data, name, artist, charter, path in cxn.execute(
+        "SELECT records.hyhash, records.chartmode, records.record, charts.name, charts.artist, charts.charter, charts.path "
+        "FROM records JOIN charts ON charts.hyhash = records.hyhash WHERE records.compatible = 0 "
+        "GROUP BY records.hyhash, records.chartmode"
+    ):
+        try:
+            if not hyutil.get_folder_chart(path):
+                continue
+            options = appstate.hydatabook.read_options(data)
+        except (OSError, hymisc.RecordFormatError):
+            continue
+        
+        if options is None:
+            options = (appstate.usettings.depth_mode, int(appstate.usettings.depth_value)) + appstate.analysis_options()
+        jobs.append(
+            (hyhash, chartmode, name, artist, charter, path)
+            + HyAppUserSettings.chartmode_options(chartmode) + options
+        )
+    cxn.close()
+    
+    appstate.batch.add(jobs, HyAppBatch.PRIORITY_LOW)
+    
+
 class HyAppState:
     """Manages Hydra's state."""
     TABLE_ROWCOUNT = 15
     TABLE_COLCOUNT = 5
     
+    # Calibrations that analysis can cover, so they can be viewed without
+    # re-analyzing. It's a lot slower, so it's opt-in.
+    CALIBRATION_SWEEP = (-50, 50)
+    
     def __init__(self):
-        self.usettings = HyAppUserSettings()
-        self.hydatabook = HyAppRecordBook()
+        self.writer = HyAppWriter()
+        self.usettings = HyAppUserSettings(self.writer)
+        self.library = HyAppLibrary()
+        self.hydatabook = HyAppRecordBook(self.writer)
+        self.batch = HyAppBatch(int(self.usettings.batch_workers))
+        self.batch.paused = self.usettings.batch_paused
         self.table_viewpage = 0
+        # Row keys of the first and last rows on the current page
+        self.table_pagekeys = (None, None)
         self.librarysize = 0
         self.search = None
         
@@ -288,6 +1204,14 @@ class HyAppState:
         self.current_path_copytext = None
         
         self.selected_song_row = None
+        
+        # The song analysis that's running (or failed and not dismissed yet)
+        self.analysis = None
+        
+        # Rows on the current page
+        self.table_entries = []
+        # Writer saves (HyAppWriter.saves) that the table has seen
+        self.table_saves = 0
     
         self.scanmodal_height_short = 190
         self.scanmodal_height_long = 320
@@ -299,13 +1223,42 @@ class HyAppState:
             
             
     def get_record(self, hyhash, chartmode):
-        try:
-            return self.hydatabook.book[hyhash]['records'][chartmode]
-        except KeyError:
-            return None
+        return self.hydatabook.get_record(hyhash, chartmode)
+    
+    def get_summary(self, hyhash, chartmode):
+        return self.hydatabook.get_summary(hyhash, chartmode)
             
     def get_selected_record(self):
         return self.get_record(self.selected_song_row[0], self.usettings.chartmode_key())
+    
+    def analysis_options(self):
+        """Analysis options (see analysis_kwargs) for the user's settings.
+        
+        Analysis at the user's ms limit is the fastest. Covering a calibration
+        other than 0 (or the whole sweep) needs a frontier record instead,
+        which can be viewed at any ms limit.
+        """
+        if self.usettings.calibration_sweep:
+            return (None, True) + self.CALIBRATION_SWEEP
+        calibration = self.usettings.calibration_ms()
+        if calibration != 0:
+            return (None, True, calibration, calibration)
+        return (self.usettings.ms_limit(), False, None, None)
+    
+    def batch_jobs(self, rows):
+        """Batch jobs for the library rows that don't have a current record
+        with the current view options."""
+        chartmode = self.usettings.chartmode_key()
+        options = (
+            self.usettings.view_difficulty, self.usettings.view_prodrums, self.usettings.view_bass2x,
+            self.usettings.depth_mode, int(self.usettings.depth_value)
+        ) + self.analysis_options()
+        jobs = []
+        for row in rows:
+            summary = self.get_summary(row[0], chartmode)
+            if not (summary and summary.is_version_compatible()):
+                jobs.append((row[0], chartmode, row[1], row[2], row[3], row[4]) + options)
+        return jobs
         
 """UI callbacks"""
 
@@ -370,9 +1323,25 @@ def on_depth_mode(sender, app_data):
 def on_mslimit_check(sender, app_data, user_data):
     appstate.usettings.mslimit_enabled = app_data
     refresh_mslimit_check()
+    refresh_mslimit_view()
     
 def on_mslimit_value(sender, app_data, user_data):
     appstate.usettings.mslimit_value = app_data
+    refresh_mslimit_view()
+
+def on_calibration_value(sender, app_data, user_data):
+    appstate.usettings.calibration = app_data
+    refresh_mslimit_view()
+
+def on_calibration_sweep(sender, app_data, user_data):
+    appstate.usettings.calibration_sweep = app_data
+
+def refresh_mslimit_view():
+    """Records with an ms frontier can show any ms limit (and any calibration
+    in their calibration range) right away."""
+    viewed_record = appstate.get_selected_record()
+    if viewed_record and viewed_record.is_version_compatible() and viewed_record.ms_frontier:
+        refresh_songdetails()
 
 def refresh_mslimit_check():
     dpg.configure_item("inp_mslimit", enabled=appstate.usettings.mslimit_enabled)
@@ -381,6 +1350,8 @@ def refresh_mslimit_check():
 def init_mslimit_state():
     dpg.set_value("mslimit_check", appstate.usettings.mslimit_enabled)
     dpg.set_value("inp_mslimit", int(appstate.usettings.mslimit_value))
+    dpg.set_value("inp_calibration", appstate.usettings.calibration_ms())
+    dpg.set_value("calibration_sweep_check", appstate.usettings.calibration_sweep)
     
 def on_scan():
     reset_scan_modal()
@@ -417,6 +1388,12 @@ def on_search_text(sender, app_data):
     appstate.table_viewpage = 0
     refresh_tableview()
 
+def on_librarysort(sender, app_data):
+    appstate.usettings.library_sort = next(k for k, label in appstate.library.SORT_LABELS.items() if label == app_data)
+    appstate.table_viewpage = 0
+    refresh_librarysort()
+    refresh_tableview()
+
 def on_library_rowclick(sender, app_data, user_data):
     # Cancel out selected states (we just want button functionality)
     for s in all_table_row_selectables():
@@ -574,60 +1551,65 @@ def on_key_c_release(sender, app_data):
     appstate.input['C'] = False
 
 def on_pageleft(sender, app_data):
-    appstate.table_viewpage = max(appstate.table_viewpage - 1, 0)
-    refresh_tableview()
+    if appstate.table_viewpage > 0:
+        appstate.table_viewpage -= 1
+        refresh_tableview(move='prev')
    
 def on_pageright(sender, app_data):
-    appstate.table_viewpage = min(appstate.table_viewpage + 1, appstate.pagecount())
-    refresh_tableview()
+    if appstate.table_viewpage < appstate.pagecount():
+        appstate.table_viewpage += 1
+        refresh_tableview(move='next')
 
 def on_run_chart(sender, app_data, user_data):
-    # Show modal
-    dpg.configure_item("songdetails", no_title_bar=True, no_close=True)
-    dpg.hide_item("songdetails_upperpanel")
-    dpg.hide_item("songdetails_lowerpanel")
-    dpg.show_item("songdetails_progresspanel")
-    reset_analyze_modal()
-    # run chart
-    try:
-        chartfile = hyutil.get_folder_chart(appstate.selected_song_row[4])
-        record, tempomap = hyutil.analyze_chart(
-            chartfile,
-            appstate.usettings.view_difficulty, appstate.usettings.view_prodrums, appstate.usettings.view_bass2x,
-            appstate.usettings.depth_mode, int(appstate.usettings.depth_value),
-            int(appstate.usettings.mslimit_value) if appstate.usettings.mslimit_enabled else None,
-            on_analyze_parsecomplete, on_analyze_pathsprogress,
-            export_tempomap=True
-        )
-    except Exception as e:
-        dpg.configure_item("songdetails_progresspanel", height=180)
-        dpg.set_value("analyze_errorcontent", repr(e))
-        dpg.show_item("analyze_errorlabel")
-        dpg.show_item("analyze_errorcontent")
-        dpg.show_item("analyze_dismissbutton")
+    if appstate.analysis and not appstate.analysis.finished:
         return
     
-    dpg.configure_item("analyze_opt_bar", overlay="")
-    dpg.set_value("analyze_opt_bar", 1)
-    dpg.show_item("analyze_opt_done")
-    
-    appstate.hydatabook.add_song(appstate.selected_song_row[0], appstate.selected_song_row[1], appstate.selected_song_row[2], appstate.selected_song_row[3], tempomap)
-    appstate.hydatabook.add_record(appstate.selected_song_row[0], appstate.usettings.chartmode_key(), record)
-
-    time.sleep(0.5)
-    on_analyze_dismiss(None, None)
+    # Analysis runs in another process; poll_analysis picks up its progress
+    appstate.analysis = HyAppAnalysis(
+        appstate.selected_song_row, appstate.usettings.chartmode_key(),
+        hyutil.get_folder_chart(appstate.selected_song_row[4]),
+        appstate.usettings.view_difficulty, appstate.usettings.view_prodrums, appstate.usettings.view_bass2x,
+        appstate.usettings.depth_mode, int(appstate.usettings.depth_value),
+        **analysis_kwargs(appstate.analysis_options())
+    )
+    appstate.batch.remove(*appstate.analysis.key)
+    reset_analyze_modal()
+    refresh_songdetails()
+    refresh_batchstatus()
 
+def on_analyze_cancel(sender, app_data):
+    if appstate.analysis:
+        appstate.analysis.cancel()
 
 def on_analyze_dismiss(sender, app_data):
-    # update record displays
-    refresh_tableview()
+    # Only shown for failed analyses
+    appstate.analysis = None
     refresh_songdetails()
-    
-    # hide modal
-    dpg.show_item("songdetails_upperpanel")
-    dpg.show_item("songdetails_lowerpanel")
-    dpg.hide_item("songdetails_progresspanel")
-    dpg.configure_item("songdetails", no_title_bar=False, no_close=False)
+
+def on_batch_queue(sender, app_data):
+    scope = dpg.get_value("batchscope_combo")
+    if scope == "This page":
+        rows = appstate.table_entries
+    else:
+        # In the table's order (but the score sort only has analyzed songs)
+        search = appstate.search if scope == "Search results" else None
+        sort = appstate.usettings.library_sort
+        rows = appstate.library.page(search, 'name' if sort == 'score' else sort, -1)
+    appstate.batch.add(appstate.batch_jobs(rows))
+    refresh_batchstatus()
+
+def on_batch_workers(sender, app_data):
+    appstate.usettings.batch_workers = app_data
+    appstate.batch.set_workers(app_data)
+
+def on_batch_pause(sender, app_data):
+    appstate.usettings.batch_paused = not appstate.usettings.batch_paused
+    appstate.batch.set_paused(appstate.usettings.batch_paused)
+    refresh_batchstatus()
+
+def on_batch_clear(sender, app_data):
+    appstate.batch.clear()
+    refresh_batchstatus()
 
 
 """Progress callbacks (reactions to processing rather than UI interactions)"""
@@ -653,6 +1635,75 @@ def on_scan_db_progress(count, totalcount):
     dpg.set_value("scanprogress_bar", count/totalcount)
     dpg.configure_item("scanprogress_bar", overlay=f"{count}/{totalcount}")
 
+def poll_analysis():
+    """Checked every frame from the render loop.
+    
+    Shows the running analysis' progress, and saves its record when it's done.
+    
+    """
+    analysis = appstate.analysis
+    if not analysis or analysis.finished:
+        return
+    
+    progress = None
+    for message in analysis.messages():
+        kind = message[0]
+        if kind == 'parsed':
+            on_analyze_parsecomplete()
+        elif kind == 'progress':
+            # Several can come in per frame, but only the latest is shown
+            progress = message[1:]
+        elif kind == 'leader':
+            on_analyze_pathsleader(*message[1:])
+        elif kind == 'done':
+            on_analyze_complete(analysis, *message[1:])
+        elif kind == 'cancelled':
+            appstate.analysis = None
+            refresh_songdetails()
+        elif kind == 'error':
+            on_analyze_error(message[1])
+    
+    if progress and appstate.analysis is analysis:
+        on_analyze_pathsprogress(*progress)
+
+def poll_saves():
+    """Checked every frame from the render loop.
+    
+    The score sort reads records from the database, so new records only show
+    up in it once the writer has saved them. Refreshing after that (instead
+    of saving from here) keeps the disk off the render thread.
+    
+    """
+    saves = appstate.writer.saves
+    if saves != appstate.table_saves:
+        appstate.table_saves = saves
+        if appstate.usettings.library_sort == 'score':
+            refresh_tableview()
+
+def poll_batch():
+    """Checked every frame from the render loop.
+    
+    Saves the records of batch jobs as they finish.
+    
+    """
+    finished = appstate.batch.poll()
+    if not finished:
+        return
+    
+    for job, result in finished:
+        if result is None:
+            continue
+        data, tempomap = result
+        hyhash, chartmode, name, artist, charter = job[:5]
+        record = appstate.hydatabook.read_record(data, tempomap)
+        appstate.hydatabook.add_song(hyhash, name, artist, charter, tempomap)
+        appstate.hydatabook.add_record(hyhash, chartmode, record)
+    
+    refresh_tableview()
+    refresh_batchstatus()
+    if appstate.selected_song_row and dpg.is_item_shown("songdetails"):
+        refresh_songdetails()
+
     
 """UI view controls"""
 
@@ -673,8 +1724,10 @@ def view_main():
     refresh_viewdifficulty()
     refresh_viewprodrums()
     refresh_viewbass2x()
+    refresh_librarysort()
     refresh_librarytitle()
     refresh_tableview()
+    refresh_batchstatus()
     
     refresh_depthvalue()
     refresh_depthmode()
@@ -705,23 +1758,45 @@ def reset_scan_modal():
     dpg.hide_item("scanprogress_dismiss")
     
 def reset_analyze_modal():
-    dpg.configure_item("songdetails_progresspanel", height=125)
+    dpg.configure_item("songdetails_progresspanel", height=150)
     dpg.hide_item("analyze_opt_label")
     dpg.hide_item("analyze_opt_bar")
-    dpg.hide_item("analyze_opt_done")
+    dpg.hide_item("analyze_leader")
     dpg.hide_item("analyze_errorlabel")
     dpg.hide_item("analyze_errorcontent")
     dpg.hide_item("analyze_dismissbutton")
+    dpg.show_item("analyze_cancelbutton")
     dpg.set_value("analyze_opt_bar", 0)
     
 def on_analyze_parsecomplete():
     dpg.show_item("analyze_opt_label")
     dpg.show_item("analyze_opt_bar")
     
-def on_analyze_pathsprogress(timecode, progressf):
-    s = timecode.measurestr(fixed_width=True) if timecode else ""
-    dpg.configure_item("analyze_opt_bar", overlay=s)
+def on_analyze_pathsprogress(measurestr, progressf):
+    dpg.configure_item("analyze_opt_bar", overlay=measurestr)
     dpg.set_value("analyze_opt_bar", progressf)
+    
+def on_analyze_pathsleader(pathstring, score_bound):
+    dpg.set_value("analyze_leader", f"Best so far: {pathstring}  ({score_bound:,}+)")
+    dpg.show_item("analyze_leader")
+    
+def on_analyze_complete(analysis, data, tempomap):
+    song_row = analysis.song_row
+    record = appstate.hydatabook.read_record(data, tempomap)
+    appstate.hydatabook.add_song(song_row[0], song_row[1], song_row[2], song_row[3], tempomap)
+    appstate.hydatabook.add_record(song_row[0], analysis.chartmode, record)
+    
+    appstate.analysis = None
+    refresh_tableview()
+    refresh_songdetails()
+    
+def on_analyze_error(error):
+    dpg.hide_item("analyze_cancelbutton")
+    dpg.configure_item("songdetails_progresspanel", height=205)
+    dpg.set_value("analyze_errorcontent", error)
+    dpg.show_item("analyze_errorlabel")
+    dpg.show_item("analyze_errorcontent")
+    dpg.show_item("analyze_dismissbutton")
 
 def refresh_chartfolder():
     dpg.delete_item("songfolder_contents", children_only=True)
@@ -750,34 +1825,71 @@ def refresh_viewprodrums():
 def refresh_viewbass2x():
     dpg.set_value("view_bass2x_check", appstate.usettings.view_bass2x)
 
+def refresh_librarysort():
+    dpg.set_value("librarysort_combo", appstate.library.SORT_LABELS[appstate.usettings.library_sort])
+
+def refresh_batchstatus():
+    batch = appstate.batch
+    dpg.set_value("inp_batchworkers", batch.workers)
+    dpg.configure_item("batchpausebutton", label="Resume" if batch.paused else "Pause")
+    
+    status = f"{len(batch)} queued"
+    if batch.paused:
+        status += " (paused)"
+    elif batch.running():
+        status += f", {batch.running()} running"
+    if batch.failed:
+        status += f", {len(batch.failed)} failed"
+    dpg.set_value("batchstatus", status)
+    
 def refresh_depthvalue():
     dpg.set_value("inp_depthvalue", int(appstate.usettings.depth_value))
 def refresh_depthmode():
     dpg.set_value("inp_depthmode", appstate.usettings.depth_mode)
 
-def refresh_tableview():
+def refresh_tableview(move=None):
     """Display a particular page of the song library.
     
+    Pages are found from the ones next to them, so moving to the next/previous
+    page is given as move='next'/'prev'. Otherwise the current page is shown
+    again (or the first page, if the page number was reset).
+    
     Other info like the size of the library is already known and doesn't need
     the db to be accessed.
     
     """    
-    cxn = sqlite3.connect(hymisc.DBPATH)
-    cur = cxn.cursor()
-
-    try:
-        if appstate.search:
-            searchparam = f"%{appstate.search}%"
-            where = "WHERE name LIKE ? OR artist LIKE ?"
-            fullcount = cur.execute(f"SELECT COUNT(*) FROM charts {where}", (searchparam, searchparam)).fetchone()[0]
-            entries = cur.execute(f"SELECT * FROM charts {where} ORDER BY name LIMIT {appstate.TABLE_ROWCOUNT} OFFSET {appstate.table_viewpage * appstate.TABLE_ROWCOUNT}", (searchparam,searchparam)).fetchall()
-        else:
-            fullcount = appstate.librarysize
-            entries = cur.execute(f"SELECT * FROM charts ORDER BY name LIMIT {appstate.TABLE_ROWCOUNT} OFFSET {appstate.table_viewpage * appstate.TABLE_ROWCOUNT}").fetchall()
-        cxn.close()
-    except sqlite3.OperationalError:
-        entries = []
-        cxn.close()
+    sort = appstate.usettings.library_sort
+    chartmode = appstate.usettings.chartmode_key()
+    
+    firstkey, lastkey = appstate.table_pagekeys
+    if appstate.table_viewpage == 0:
+        seek = {}
+    elif move == 'next':
+        seek = {'after': lastkey}
+    elif move == 'prev':
+        seek = {'before': firstkey}
+    else:
+        seek = {'at': firstkey}
+    entries = appstate.library.page(appstate.search, sort, appstate.TABLE_ROWCOUNT, chartmode=chartmode, **seek)
+    
+    if not entries and appstate.table_viewpage > 0:
+        # The page isn't there anymore
+        appstate.table_viewpage = 0
+        entries = appstate.library.page(appstate.search, sort, appstate.TABLE_ROWCOUNT, chartmode=chartmode)
+    
+    # Batch analysis does what's on screen first
+    appstate.table_entries = entries
+    appstate.batch.visible = {(row[0], chartmode) for row in entries}
+    
+    if entries:
+        appstate.table_pagekeys = (appstate.library.row_key(entries[0], sort), appstate.library.row_key(entries[-1], sort))
+    else:
+        appstate.table_pagekeys = (None, None)
+    
+    if appstate.search or sort == 'score':
+        fullcount = appstate.library.count(appstate.search, sort, chartmode)
+    else:
+        fullcount = appstate.librarysize
             
     # subset of db columns shown on the table
     colkeys = ['name', 'artist', 'charter', 'folder']
@@ -801,10 +1913,10 @@ def refresh_tableview():
                 
         # Fill record-based cell
         try:
-            record = appstate.get_record(entries[r][0], appstate.usettings.chartmode_key())
-            if record:
-                if record.is_version_compatible():
-                    dpg.configure_item(f"table[{r}, {appstate.TABLE_COLCOUNT - 1}]", label=record.best_path().pathstring(), user_data=entries[r])
+            summary = appstate.get_summary(entries[r][0], appstate.usettings.chartmode_key())
+            if summary:
+                if summary.is_version_compatible():
+                    dpg.configure_item(f"table[{r}, {appstate.TABLE_COLCOUNT - 1}]", label=summary.best_path, user_data=entries[r])
                     dpg.bind_item_theme(f"table[{r}, {appstate.TABLE_COLCOUNT - 1}]", "bestpath_theme")
                     dpg.bind_item_font(f"table[{r}, {appstate.TABLE_COLCOUNT - 1}]", "MonoFont")
                 else:
@@ -847,12 +1959,26 @@ def refresh_songdetails():
     dpg.set_value("songdetails_songhash", appstate.selected_song_row[0])
     
     dpg.configure_item("songdetails", label=f"Song Details\t\t\t\t{appstate.usettings.chartmode_key()}")
+    
+    # The analysis' progress takes over the details of the song it's for
+    analysis = appstate.analysis
+    if analysis and analysis.key == (appstate.selected_song_row[0], appstate.usettings.chartmode_key()):
+        dpg.hide_item("songdetails_upperpanel")
+        dpg.hide_item("songdetails_lowerpanel")
+        dpg.show_item("songdetails_progresspanel")
+        return
+    
+    dpg.show_item("songdetails_upperpanel")
+    dpg.show_item("songdetails_lowerpanel")
+    dpg.hide_item("songdetails_progresspanel")
         
     viewed_record = appstate.get_selected_record()
     
     # Enable / Disable analyze button (everything else can work off of
     # saved data, but analysis requires the chart to be here immediately)
-    if hyutil.get_folder_chart(appstate.selected_song_row[4]):
+    if analysis and not analysis.finished:
+        dpg.configure_item("runbutton", enabled=False, label="Analyzing another song...")
+    elif hyutil.get_folder_chart(appstate.selected_song_row[4]):
         dpg.configure_item("runbutton", enabled=True, label="Analyze paths!")
     else:
         dpg.configure_item("runbutton", enabled=False, label="Song file not found.\nTry scanning again.")
@@ -892,14 +2018,27 @@ def refresh_songdetails():
     current_treenode = None
     
     
+    if viewed_record.ms_frontier:
+        ms_limit = appstate.usettings.ms_limit()
+    else:
+        ms_limit = viewed_record.ms_limit
+    
+    # Records without a calibration sweep can only be viewed as analyzed
+    low, high = viewed_record.calibration_range()
+    calibration = min(max(appstate.usettings.calibration_ms(), low), high)
+    
     is_first_path = True
-    for p in viewed_record.all_paths():
+    autoselect = None
+    for p in viewed_record.view_paths(ms_limit, calibration):
         if current_score != p.totalscore():
             current_score_tier += 1
             if current_score_tier == 1:
-                dpg.add_separator(parent="songdetails_pathpanel", label="Optimal Path")
+                ap_suffix = "" if not viewed_record.is_approximate() else f" (Approximate: within {viewed_record.approx_gap:,} pts)"
+                if calibration != 0:
+                    ap_suffix += f" (Calibration: {calibration:+} ms)"
+                dpg.add_separator(parent="songdetails_pathpanel", label=f"Optimal Path{ap_suffix}")
             elif current_score_tier == 2:
-                ep_suffix = "" if viewed_record.ms_limit is None else f" (Limit timings: {viewed_record.ms_limit} ms)"
+                ep_suffix = "" if ms_limit is None else f" (Limit timings: {ms_limit} ms)"
                 dpg.add_separator(parent="songdetails_pathpanel", label=f"More Paths{ep_suffix}")
             current_score = p.totalscore()
             current_treenode = dpg.add_tree_node(label=f"{current_score:,}", parent="songdetails_pathpanel", default_open=True)
@@ -917,23 +2056,21 @@ def refresh_songdetails():
                         dpg.bind_item_theme(dpg.last_item(), "warning_theme")
         if is_first_path:
             autoselect = pathselectable
+            autoselect_path = p
         is_first_path = False
     
+    if autoselect is None:
+        dpg.add_text("No paths are possible with this calibration.", parent="songdetails_pathpanel")
+        return
+    
     # Auto select the first path
-    on_path_selected(autoselect, True, viewed_record.best_path())
+    on_path_selected(autoselect, True, autoselect_path)
 
     
 """ Utility"""
 
 def cache_librarysize():
-    cxn = sqlite3.connect(hymisc.DBPATH)
-    cur = cxn.cursor()
-    try:
-        cur.execute("SELECT COUNT(*) FROM charts")
-        appstate.librarysize = cur.fetchone()[0]
-    except sqlite3.OperationalError:
-        appstate.librarysize = 0
-    cxn.close()
+    appstate.librarysize = appstate.library.count()
 
 def all_table_row_selectables():
     return [f"table[{r}, {appstate.TABLE_COLCOUNT - 1}]" for r in range(appstate.TABLE_ROWCOUNT)]
@@ -1048,6 +2185,11 @@ def build_main_ui():
             with dpg.group(horizontal=True, tag="librarysearch"):
                 dpg.add_text("Search:")
                 dpg.add_input_text(callback=on_search_text, width=282)
+                dpg.add_text("Sort:")
+                dpg.add_combo(
+                    list(HyAppLibrary.SORT_LABELS.values()),
+                    tag="librarysort_combo", width=120, callback=on_librarysort
+                )
             
             dpg.add_spacer(height=2)
             with dpg.table(tag="librarytable"):
@@ -1071,6 +2213,17 @@ def build_main_ui():
                 dpg.add_button(tag="pageleftbutton", arrow=True, direction=dpg.mvDir_Left, callback=on_pageleft)
                 dpg.add_text("0/0", tag= "librarypagelabel")
                 dpg.add_button(tag="pagerightbutton", arrow=True, direction=dpg.mvDir_Right, callback=on_pageright)
+            
+            dpg.add_spacer(height=2)
+            with dpg.group(horizontal=True, tag="librarybatchcontrols"):
+                dpg.add_text("Analyze all:")
+                dpg.add_combo(("This page", "Search results", "Whole library"), tag="batchscope_combo", default_value="This page", width=160)
+                dpg.add_button(label="Queue", callback=on_batch_queue)
+                dpg.add_text("Workers:")
+                dpg.add_input_int(tag="inp_batchworkers", min_value=1, min_clamped=True, max_value=os.cpu_count() or 1, max_clamped=True, width=100, callback=on_batch_workers)
+                dpg.add_button(tag="batchpausebutton", label="Pause", callback=on_batch_pause)
+                dpg.add_button(label="Clear", callback=on_batch_clear)
+                dpg.add_text("", tag="batchstatus")
         
         dpg.add_text("No songs scanned. Set a folder and scan songs to get started!", tag="libraryempty", show=False)
         
@@ -1125,6 +2278,14 @@ def build_main_ui():
                     dpg.add_checkbox(tag="mslimit_check", indent=100, callback=on_mslimit_check)
                     dpg.add_input_int(tag="inp_mslimit", indent=140, min_value=-200, min_clamped=True, max_value=200, max_clamped=True, width=100, default_value=0, callback=on_mslimit_value)
                     dpg.add_text("ms", tag="mslimit_mstext")
+                with dpg.group(horizontal=True):
+                    dpg.add_text(" Calibration:")
+                    dpg.add_input_int(tag="inp_calibration", indent=140, min_value=appstate.CALIBRATION_SWEEP[0], min_clamped=True, max_value=appstate.CALIBRATION_SWEEP[1], max_clamped=True, width=100, default_value=0, callback=on_calibration_value)
+                    dpg.add_text("ms")
+                with dpg.group(horizontal=True):
+                    dpg.add_text(" Cover -50 to 50ms:")
+                    dpg.add_checkbox(tag="calibration_sweep_check", indent=140, callback=on_calibration_sweep)
+                    dpg.add_text("(slower)")
                 dpg.add_spacer(height=0)
                 dpg.add_button(tag="runbutton", label="Analyze paths!", width=-1,height=-1, callback=on_run_chart)
                 dpg.bind_item_font(dpg.last_item(), "MainFont24")
@@ -1149,11 +2310,13 @@ def build_main_ui():
                 dpg.add_text("Running paths...", tag="analyze_opt_label", show=False)
                 dpg.add_progress_bar(tag="analyze_opt_bar", show=False, width=-18)
                 dpg.bind_item_font("analyze_opt_bar", "MonoFont")
-                dpg.add_text("Done!", tag="analyze_opt_done", show=False)
+                dpg.add_text("", tag="analyze_leader", show=False)
+                dpg.bind_item_font(dpg.last_item(), "MonoFont")
                 dpg.add_text("An error occurred:", tag="analyze_errorlabel", show=False)
                 dpg.add_text("", tag="analyze_errorcontent", show=False)
                 dpg.bind_item_font(dpg.last_item(), "MonoFont")
                 dpg.add_button(tag="analyze_dismissbutton", label="Continue", callback=on_analyze_dismiss, show=False)
+                dpg.add_button(tag="analyze_cancelbutton", label="Cancel", callback=on_analyze_cancel, show=False)
     
     dpg.set_viewport_resize_callback(on_viewport_resize)
     on_viewport_resize()
@@ -1162,6 +2325,9 @@ def build_main_ui():
 if __name__ == '__main__':
     # appstate is visible to the top-level functions
     appstate = HyAppState()
+    
+    # Records from older versions of Hydra get analyzed again in the background
+    threading.Thread(target=queue_outdated_records, name="HyAppOutdatedRecords", daemon=True).start()
             
     dpg.create_context()
     
@@ -1192,6 +2358,11 @@ if __name__ == '__main__':
     setupframe = 0
     while dpg.is_dearpygui_running():
         dpg.render_dearpygui_frame()
+        poll_analysis()
+        if setupframe > 2:
+            # Queued jobs pick up where they left off once the UI is ready
+            poll_batch()
+            poll_saves()
         
         if setupframe == 1:
             # Loading window has rendered, so start some hitch-y setup
@@ -1206,4 +2377,9 @@ if __name__ == '__main__':
     dpg.start_dearpygui()
 
     # End UI
-    dpg.destroy_context()
\ No newline at end of file
+    dpg.destroy_context()
+    
+    # Stop batch analysis (what's left stays queued) and finish saving
+    # anything that's still waiting
+    appstate.batch.close()
+    appstate.writer.close()
\ No newline at end of file
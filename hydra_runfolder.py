@@ -42,13 +42,17 @@ if __name__ == "__main__":
                 'records': {},
             }
         
-        record = hyutil.analyze_chart(
-            chartfile, 
-            'Expert', True, True,
+        # Every chartmode in one run
+        records = hyutil.analyze_chart_modes(
+            chartfile,
+            'Expert',
             'scores', 0,
         )
-        book[hyhash]['records']['Expert Pro Drums, 2x Bass'] = record
-        records_count += 1
+        for (m_pro, m_bass2x), record in records.items():
+            prodrums = "Pro Drums" if m_pro else "Drums"
+            bass = "2x Bass" if m_bass2x else "1x Bass"
+            book[hyhash]['records'][f"Expert {prodrums}, {bass}"] = record
+            records_count += 1
         
     with open(outfile, mode='w', encoding='utf-8') as output_json:
         json.dump(book, output_json, default=hydata.json_save, separators=(',', ':'))
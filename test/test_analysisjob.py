@@ -0,0 +1,62 @@
+import os
+import queue
+import threading
+import unittest
+
+import hydra.hyutil as hyutil
+import hydra.hycodec as hycodec
+import hydra.hymisc as hymisc
+
+
+class TestAnalysisJob(unittest.TestCase):
+    """Analysis jobs should report their progress and finish with exactly one
+    final message."""
+    def setUp(self):
+        self.chartfile = os.sep.join(["..","test","input","test_e","100bpm.chart"])
+
+    def _run(self, chartfile, cancelled=False):
+        messages = queue.Queue()
+        cancel_event = threading.Event()
+        if cancelled:
+            cancel_event.set()
+        hyutil.analyze_chart_job(messages, cancel_event, chartfile, 'expert', True, True, 'scores', 2)
+
+        result = []
+        while not messages.empty():
+            result.append(messages.get())
+        return result
+
+    def test_done(self):
+        messages = self._run(self.chartfile)
+        kinds = [m[0] for m in messages]
+        self.assertEqual(kinds[0], 'parsed')
+        self.assertIn('progress', kinds)
+        self.assertEqual(kinds[-1], 'done')
+        self.assertNotIn('done', kinds[:-1])
+
+        # Same as analyzing directly
+        record = hycodec.loads(messages[-1][1])
+        direct, tempomap = hyutil.analyze_chart(self.chartfile, 'expert', True, True, 'scores', 2, export_tempomap=True)
+        self.assertEqual(record.best_path().totalscore(), direct.best_path().totalscore())
+        self.assertEqual(messages[-1][2], tempomap)
+
+    def test_cancelled(self):
+        self.assertEqual(self._run(self.chartfile, cancelled=True), [('cancelled',)])
+
+    def test_error(self):
+        messages = self._run(os.sep.join(["..","test","input","missing.chart"]))
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0][0], 'error')
+
+    def test_task(self):
+        # Same as a pool would run it, but in this process
+        cancel_event = threading.Event()
+        hyutil.init_analysis_worker(cancel_event)
+        data, tempomap = hyutil.analyze_chart_task(self.chartfile, 'expert', True, True, 'scores', 2)
+        direct = hyutil.analyze_chart(self.chartfile, 'expert', True, True, 'scores', 2)
+        self.assertEqual(hycodec.loads(data).best_path().totalscore(), direct.best_path().totalscore())
+
+        cancel_event.set()
+        with self.assertRaises(hymisc.AnalysisCancelled):
+            hyutil.analyze_chart_task(self.chartfile, 'expert', True, True, 'scores', 2)
+        hyutil.init_analysis_worker(threading.Event())
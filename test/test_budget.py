@@ -0,0 +1,60 @@
+import os
+import unittest
+import json
+
+import hydra.hyutil as hyutil
+import hydra.hydata as hydata
+import hydra.hypath as hypath
+
+
+class TestBudget(unittest.TestCase):
+    """Tests for budgeted analysis falling back to beam search."""
+    def setUp(self):
+        self.chartfolder = os.sep.join(["..","test","input","test_sb25"])
+
+    def _analyze(self, chartname, **kwargs):
+        return hyutil.analyze_chart(
+            self.chartfolder + os.sep + chartname,
+            'expert', True, True,
+            'scores', 4,
+            **kwargs
+        )
+
+    def test_unbudgeted_is_exact(self):
+        record = self._analyze("allies.chart")
+        self.assertFalse(record.is_approximate())
+
+    def test_unexceeded_budget_is_exact(self):
+        record = self._analyze("allies.chart", time_budget=3600, frontier_budget=100000)
+        self.assertFalse(record.is_approximate())
+
+    def test_beam_gap_bound(self):
+        exact = self._analyze("allies.chart")
+        for i, beam_width in enumerate([1, 2, 4]):
+            with self.subTest(i=i):
+                approx = self._analyze("allies.chart", frontier_budget=0, beam_width=beam_width)
+                self.assertTrue(approx.is_approximate())
+                self.assertLessEqual(approx.best_path().totalscore(), exact.best_path().totalscore())
+                self.assertGreaterEqual(
+                    approx.best_path().totalscore() + approx.approx_gap,
+                    exact.best_path().totalscore()
+                )
+
+    def test_beam_without_drops_is_exact(self):
+        exact = self._analyze("allies.chart")
+        record = self._analyze("allies.chart", frontier_budget=0, beam_width=1000000)
+        self.assertFalse(record.is_approximate())
+        self.assertEqual(record.best_path().totalscore(), exact.best_path().totalscore())
+
+    def test_time_budget_stops_comparing(self):
+        keys = [(0, score, False, None, None) for score in range(100)]
+        removed, beaten_by = hypath.compare_paths(keys, range(len(keys)), False, 'scores', 0, False, None, False)
+        self.assertEqual(len(beaten_by), 99)
+        removed, beaten_by = hypath.compare_paths(keys, range(len(keys)), False, 'scores', 0, False, None, False, time_left=0)
+        self.assertEqual(beaten_by, {})
+
+        # Out of time from the start: the beam takes over, and the best path is still in bounds
+        exact = self._analyze("allies.chart")
+        approx = self._analyze("allies.chart", time_budget=0, beam_width=2)
+        self.assertTrue(approx.is_approximate())
+        self.assertGreaterEqual(approx.best_path().totalscore() + approx.approx_gap, exact.best_path().totalscore())
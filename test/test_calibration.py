@@ -0,0 +1,100 @@
+import os
+import unittest
+
+import hydra.hyutil as hyutil
+import hydra.hydata as hydata
+
+
+class TestCalibration(unittest.TestCase):
+    """Records made with a calibration sweep should match analysis done at
+    just one calibration, for any calibration in the sweep."""
+    def setUp(self):
+        self.chartfolder = os.sep.join(["..","test","input","test_e"])
+
+    def _analyze(self, chartname, e_sweep):
+        return hyutil.analyze_chart(
+            self.chartfolder + os.sep + chartname,
+            'expert', True, True,
+            'scores', 2,
+            e_sweep=e_sweep
+        )
+
+    def _test_sweep(self, chartname):
+        sweep_record = self._analyze(chartname, (-60, 60))
+
+        def best_passing(paths, ms_filter):
+            return max((p.totalscore() for p in paths if ms_filter is None or p.passes_ms_filter(ms_filter)), default=None)
+
+        for i, calibration in enumerate([-60, -25, 0, 25, 60]):
+            with self.subTest(i=i):
+                single_record = self._analyze(chartname, (calibration, calibration))
+                for ms_filter in [None, -50, 0, 50]:
+                    view = list(sweep_record.view_paths(ms_filter, calibration))
+                    single_view = list(single_record.view_paths(ms_filter, calibration))
+
+                    self.assertEqual(view[0].totalscore(), single_view[0].totalscore())
+                    self.assertEqual(best_passing(view, ms_filter), best_passing(single_view, ms_filter))
+
+    def test_sweep_100bpm(self):
+        self._test_sweep("100bpm.chart")
+
+    def test_sweep_240bpm(self):
+        self._test_sweep("240bpm.chart")
+
+    def test_sweep_oppressor(self):
+        self._test_sweep("oppressor.mid")
+
+    def test_activation_at_calibration(self):
+        act = hydata.Activation()
+        act.skips = 1
+        act.e_offset = -40.0
+        act.fill_e_offsets = [-40.0, 500.0]
+
+        # Both fills show up
+        self.assertEqual(act.at_calibration(0).notationstr(), "E1")
+
+        # The E fill doesn't show up, so it isn't counted as a skip
+        self.assertEqual(act.at_calibration(-50).notationstr(), "0")
+
+        # The E fill always shows up
+        self.assertEqual(act.at_calibration(120).notationstr(), "1")
+
+        # The activation's own fill doesn't show up
+        self.assertIsNone(act.at_calibration(-600))
+
+    def test_no_possible_paths(self):
+        act = hydata.Activation()
+        act.skips = 0
+        act.e_offset = 0.0
+        act.fill_e_offsets = [0.0]
+        path = hydata.Path()
+        path._activations = [act]
+
+        record = hydata.HydraRecord()
+        record.ms_frontier = True
+        record.depth_mode = 'scores'
+        record.depth_value = 1
+        record.e_sweep = (-100, 0)
+        record._paths = [path]
+
+        # The activation's fill doesn't show up at -100 ms
+        self.assertEqual(list(record.view_paths(None, -100)), [])
+        self.assertEqual(len(list(record.view_paths(None, 0))), 1)
+
+    def test_best_view_path(self):
+        # The E fills need calibrating, so the path plays out differently
+        for chartname, calibration in [("240bpm.chart", -50), ("100bpm.chart", 40)]:
+            with self.subTest(chartname=chartname):
+                record = self._analyze(chartname, (calibration, calibration))
+                self.assertEqual(record.own_calibration(), calibration)
+
+                shown = next(record.view_paths(None, calibration))
+                best = record.best_view_path()
+                self.assertEqual(best.pathstring(), shown.pathstring())
+                self.assertEqual(best.difficulty(), shown.difficulty())
+                self.assertNotEqual(best.difficulty(), record.best_path().difficulty())
+
+    def test_outside_range(self):
+        record = self._analyze("100bpm.chart", (-10, 10))
+        with self.assertRaises(ValueError):
+            list(record.view_paths(None, 20))
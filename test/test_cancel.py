@@ -0,0 +1,45 @@
+import os
+import unittest
+import json
+
+import hydra.hyutil as hyutil
+import hydra.hymisc as hymisc
+
+
+class TestCancel(unittest.TestCase):
+    """Tests for cancelling an analysis partway through."""
+    def setUp(self):
+        self.chartfolder = os.sep.join(["..","test","input","test_sb25"])
+    
+    def _analyze(self, chartname, cancel, cb_pathsprogress=None):
+        return hyutil.analyze_chart(
+            self.chartfolder + os.sep + chartname,
+            'expert', True, True,
+            'scores', 4,
+            cb_pathsprogress=cb_pathsprogress,
+            cancel=cancel
+        )
+    
+    def test_cancel_before_parse(self):
+        for i, chartname in enumerate(["allies.chart", "youngrobot.mid"]):
+            with self.subTest(i=i):
+                cancel = hymisc.CancelToken()
+                cancel.cancel()
+                with self.assertRaises(hymisc.AnalysisCancelled):
+                    self._analyze(chartname, cancel)
+    
+    def test_cancel_during_paths(self):
+        cancel = hymisc.CancelToken()
+        progress = []
+        def on_progress(timecode, progressf):
+            progress.append(progressf)
+            if progressf > 0.5:
+                cancel.cancel()
+        
+        with self.assertRaises(hymisc.AnalysisCancelled):
+            self._analyze("allies.chart", cancel, on_progress)
+        self.assertLess(progress[-1], 1.0)
+    
+    def test_uncancelled(self):
+        record = self._analyze("allies.chart", hymisc.CancelToken())
+        self.assertEqual(record.best_path().pathstring(), "0 1 1 0")
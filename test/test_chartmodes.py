@@ -0,0 +1,59 @@
+import os
+import unittest
+
+import hydra.hyutil as hyutil
+import hydra.hypath as hypath
+
+
+class TestChartmodes(unittest.TestCase):
+    """Analyzing every chartmode at once should give the same paths as
+    analyzing each chartmode on its own."""
+    def setUp(self):
+        self.chartfolder = os.sep.join(["..","test","input","test_sb25"])
+
+    def _path_values(self, record):
+        # Shared paths only merge as variants once they've converged on every
+        # graph, so ties can come in another order and branch off later
+        return sorted(
+            (p.pathstring(), p.totalscore(), p.is_variant())
+            for p in record.all_paths()
+        )
+
+    def _test_chartmodes(self, chartname, d_mode, d_value, ms_filter=None):
+        chartfile = self.chartfolder + os.sep + chartname
+        records = hyutil.analyze_chart_modes(chartfile, 'expert', d_mode, d_value, ms_filter=ms_filter)
+        self.assertEqual(set(records.keys()), set(hyutil.CHARTMODES))
+
+        for i, (m_pro, m_bass2x) in enumerate(hyutil.CHARTMODES):
+            with self.subTest(i=i):
+                record = hyutil.analyze_chart(chartfile, 'expert', m_pro, m_bass2x, d_mode, d_value, ms_filter)
+                shared_record = records[(m_pro, m_bass2x)]
+
+                # Every path (each record trimmed to its own depth)
+                self.assertEqual(self._path_values(shared_record), self._path_values(record))
+
+    def test_scores_depth(self):
+        self._test_chartmodes("allies.chart", 'scores', 3)
+
+    def test_points_depth(self):
+        self._test_chartmodes("actors.mid", 'points', 500)
+
+    def test_ms_filter(self):
+        self._test_chartmodes("avalanche.mid", 'scores', 1, ms_filter=0)
+
+    def test_mixed_structure(self):
+        # The 1x bass chartmodes of this chart have different SP timing
+        chartfile = self.chartfolder + os.sep + "b.mid"
+        graphs = []
+        for m_pro, m_bass2x in [(True, True), (True, False)]:
+            parser = hyutil.chart_parser(chartfile)
+            parser.parsefile(chartfile, 'expert', m_pro, m_bass2x)
+            graphs.append(hypath.ScoreGraph(parser.song))
+        self.assertFalse(graphs[0].shares_structure(graphs[1]))
+
+        self._test_chartmodes("b.mid", 'scores', 1)
+        self._test_chartmodes("b.mid", 'scores', 2)
+
+    def test_variants(self):
+        # Ties that converge on some chartmodes before others
+        self._test_chartmodes("aprilhaha.chart", 'scores', 2)
@@ -0,0 +1,122 @@
+import os
+import sys
+import unittest
+
+import hydra.hyutil as hyutil
+import hydra.hycodec as hycodec
+import hydra.hymisc as hymisc
+
+
+class TestCodec(unittest.TestCase):
+    """Records should come back the same after a trip through the binary
+    record format."""
+    def setUp(self):
+        self.inputfolder = os.sep.join(["..","test","input"])
+
+    def _path_values(self, path):
+        # Loaded timecodes are just ticks
+        def ticks(tc):
+            return tc if isinstance(tc, int) else tc.ticks
+
+        return (
+            path.pathstring(), path.totalscore(), path.difficulty(), path.is_variant(),
+            path.notecount, path.leftover_sp, len(path.multsqueezes),
+            [
+                (ticks(act.timecode), act.chord.code(), act.sp_meter, act.frontend_points, act.e_offset, list(act.fill_e_offsets))
+                for act in path.all_activations()
+            ],
+            [
+                (ticks(bsq.timecode), bsq.chord.code(), bsq.points, bsq.sqout_points, bsq.is_sp, bsq.offset_ms)
+                for act in path.all_activations() for bsq in act.backends
+            ],
+        )
+
+    def _test_roundtrip(self, chartfile, **kwargs):
+        record = hyutil.analyze_chart(chartfile, 'expert', True, True, 'scores', 1, **kwargs)
+        data = hycodec.dumps(record)
+        loaded = hycodec.loads(data)
+
+        for attr in ['hyversion', 'ms_limit', 'ms_frontier', 'depth_mode', 'depth_value', 'e_sweep', 'approx_gap']:
+            self.assertEqual(getattr(loaded, attr), getattr(record, attr))
+        self.assertEqual(
+            [self._path_values(p) for p in loaded.all_paths()],
+            [self._path_values(p) for p in record.all_paths()]
+        )
+
+        # Loaded records encode the same way
+        self.assertEqual(hycodec.dumps(loaded), data)
+
+    @unittest.skipIf('fast' in sys.argv, "Skipping slow tests.")
+    def test_roundtrip_fixtures(self):
+        chartfiles = []
+        for folder in sorted(os.listdir(self.inputfolder)):
+            for f in sorted(os.listdir(self.inputfolder + os.sep + folder)):
+                if f.endswith(".mid") or f.endswith(".chart"):
+                    chartfiles.append(os.sep.join([self.inputfolder, folder, f]))
+
+        for i, chartfile in enumerate(chartfiles):
+            with self.subTest(i=i, chartfile=chartfile):
+                self._test_roundtrip(chartfile)
+
+    def test_roundtrip_sweep(self):
+        self._test_roundtrip(os.sep.join([self.inputfolder, "test_e", "oppressor.mid"]), e_sweep=(-50, 50))
+
+    def test_roundtrip_approximate(self):
+        self._test_roundtrip(os.sep.join([self.inputfolder, "test_sb25", "allies.chart"]), frontier_budget=0, beam_width=1)
+
+    def test_iter_paths(self):
+        record = hyutil.analyze_chart(os.sep.join([self.inputfolder, "test_sb25", "allies.chart"]), 'expert', True, True, 'scores', 2)
+        best = next(hycodec.iter_paths(hycodec.dumps(record)))
+        self.assertEqual(best.pathstring(), record.best_path().pathstring())
+
+    def test_shared_activations(self):
+        record = hyutil.analyze_chart(os.sep.join([self.inputfolder, "test_pathcount", "album.mid"]), 'expert', True, True, 'scores', 4)
+        data = hycodec.dumps(record)
+        loaded = hycodec.loads(data)
+
+        # Equal activations are stored once and come back as one object
+        activations = [act for path in loaded.all_paths() for act in path._activations]
+        shared = {id(act): act for act in activations}
+        self.assertLess(len(shared), len(activations))
+        writer = hycodec.RecordWriter()
+        writer._table([bsq for act in shared.values() for bsq in act.backends], writer.backend_entry)
+        table = writer._table(shared.values(), writer.activation_entry)
+        self.assertEqual(len(shared), len(table))
+        self.assertEqual(hycodec.dumps(loaded), data)
+
+        # Sorted by time, so ticks are written as deltas
+        self.assertEqual([ticks for ticks, entry in table], sorted(act.timecode for act in shared.values()))
+
+    def test_outdated(self):
+        record = hyutil.analyze_chart(os.sep.join([self.inputfolder, "test_sb25", "allies.chart"]), 'expert', True, True, 'scores', 0)
+        record.hyversion = (0, 0, 1)
+        loaded = hycodec.loads(hycodec.dumps(record))
+        self.assertEqual(loaded.hyversion, (0, 0, 1))
+        self.assertFalse(loaded.is_version_compatible())
+
+        # The options are still there, to analyze it again with
+        header = hycodec.loads_header(hycodec.dumps(record))
+        self.assertEqual((header.depth_mode, header.depth_value), ('scores', 0))
+        self.assertEqual(header._paths, [])
+
+    def test_old_format(self):
+        # 100bpm.chart (expert, pro drums, 2x bass, scores 0)
+        # as written by format version 1, for Hydra 1.2.0
+        data = bytes.fromhex(
+            "485952010301020000000101000000010001008024012e010401640000020000000000c042c001020000000000c042c0d80400c80100000006010000000000"
+        )
+        record = hycodec.loads(data)
+        self.assertEqual(record.hyversion, (1, 2, 0))
+        self.assertFalse(record.is_version_compatible())
+        self.assertEqual(record._paths, [])
+
+        # Its options are still there, to analyze it again with
+        header = hycodec.loads_header(data)
+        self.assertEqual((header.depth_mode, header.depth_value, header.ms_frontier, header.e_sweep), ('scores', 0, False, None))
+
+    def test_invalid(self):
+        with self.assertRaises(hymisc.RecordFormatError):
+            hycodec.loads(b"{}")
+        record = hyutil.analyze_chart(os.sep.join([self.inputfolder, "test_sb25", "allies.chart"]), 'expert', True, True, 'scores', 0)
+        with self.assertRaises(hymisc.RecordFormatError):
+            hycodec.loads(hycodec.dumps(record)[:-3])
@@ -0,0 +1,75 @@
+import os
+import pathlib
+import tempfile
+import unittest
+
+import hydra.hyutil as hyutil
+
+
+class TestDiscover(unittest.TestCase):
+    """Chart discovery should find every folder with both a chart and an ini,
+    however many threads it uses."""
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.root = self.tempdir.name
+
+        self.expected = set()
+        for i in range(20):
+            folder = os.path.join(self.root, f"pack{i % 3}", f"sub{i % 2}", f"song{i}")
+            os.makedirs(folder)
+            chartname = "notes.mid" if i % 2 else "notes.chart"
+            pathlib.Path(folder, chartname).touch()
+            pathlib.Path(folder, "song.ini").touch()
+            self.expected.add((
+                os.path.join(folder, chartname), os.path.join(folder, "song.ini"),
+                folder, os.path.join(f"pack{i % 3}", f"sub{i % 2}")
+            ))
+
+        # Missing an ini, and missing a chart
+        os.makedirs(os.path.join(self.root, "nochart"))
+        pathlib.Path(self.root, "nochart", "song.ini").touch()
+        os.makedirs(os.path.join(self.root, "noini"))
+        pathlib.Path(self.root, "noini", "notes.mid").touch()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_discover(self):
+        for workers in [1, 4]:
+            with self.subTest(workers=workers):
+                progress = []
+                charts, errors = hyutil.discover_charts([self.root], progress.append, workers=workers, progress_interval=0)
+                self.assertEqual(set(charts), self.expected)
+                self.assertEqual(len(charts), len(self.expected))
+                self.assertEqual(errors, [])
+                self.assertEqual(progress, sorted(progress))
+                self.assertEqual(progress[-1], len(self.expected) + 2)
+
+    def test_throttled_progress(self):
+        progress = []
+        hyutil.discover_charts([self.root], progress.append, progress_interval=3600)
+        self.assertEqual(progress, [len(self.expected) + 2])
+
+    def test_overlapping_roots(self):
+        charts, errors = hyutil.discover_charts([self.root, os.path.join(self.root, "pack0")])
+        self.assertEqual(len(charts), len(self.expected))
+
+    @unittest.skipIf(not hasattr(os, "symlink"), "No symlinks.")
+    def test_symlink_loop(self):
+        try:
+            os.symlink(self.root, os.path.join(self.root, "pack0", "loop"))
+            os.symlink(os.path.join(self.root, "pack1"), os.path.join(self.root, "pack2", "link"))
+        except OSError:
+            self.skipTest("Can't make symlinks here.")
+        charts, errors = hyutil.discover_charts([self.root])
+        self.assertEqual(errors, [])
+        self.assertTrue(self.expected <= set(charts))
+
+        # pack1 is found through the link as well as on its own
+        linked = [c for c in charts if os.path.join("pack2", "link") in c[3]]
+        self.assertEqual(len(linked), len([c for c in self.expected if c[3].startswith("pack1")]))
+
+    def test_missing_root(self):
+        charts, errors = hyutil.discover_charts([os.path.join(self.root, "missing"), self.root])
+        self.assertEqual(set(charts), self.expected)
+        self.assertEqual(len(errors), 1)
@@ -0,0 +1,41 @@
+import os
+import unittest
+import json
+
+import hydra.hyutil as hyutil
+import hydra.hydata as hydata
+
+
+class TestLeader(unittest.TestCase):
+    """Tests for the best-so-far path streamed during analysis."""
+    def setUp(self):
+        self.chartfolder = os.sep.join(["..","test","input","test_sb25"])
+    
+    def _test_leader(self, chartname, ms_filter=None):
+        updates = []
+        record = hyutil.analyze_chart(
+            self.chartfolder + os.sep + chartname,
+            'expert', True, True,
+            'scores', 4,
+            ms_filter,
+            cb_pathsleader=lambda pathstr, bound: updates.append((pathstr, bound))
+        )
+        
+        # Lower bounds only go up, and never past the optimal score
+        bounds = [bound for _, bound in updates]
+        self.assertEqual(bounds, sorted(set(bounds)))
+        
+        # Final lower bound is the best score that passes the filter
+        passing = [p for p in record.all_paths() if ms_filter is None or p.passes_ms_filter(ms_filter)]
+        best_score = max(p.totalscore() for p in passing)
+        self.assertEqual(updates[-1][1], best_score)
+        self.assertIn(updates[-1][0], [p.pathstring() for p in passing if p.totalscore() == best_score])
+    
+    def test_leader_allies(self):
+        self._test_leader("allies.chart")
+        
+    def test_leader_limbfromlimb(self):
+        self._test_leader("limbfromlimb.chart")
+    
+    def test_leader_senescence_filtered(self):
+        self._test_leader("senescence.chart", -20)
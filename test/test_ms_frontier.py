@@ -0,0 +1,53 @@
+import os
+import unittest
+import json
+
+import hydra.hyutil as hyutil
+import hydra.hydata as hydata
+
+
+class TestMsFrontier(unittest.TestCase):
+    """Records made with an ms frontier should match records made with a
+    single ms filter, for any ms filter."""
+    def setUp(self):
+        self.chartfolder = os.sep.join(["..","test","input","test_sb25"])
+    
+    def _analyze(self, chartname, ms_filter, ms_frontier=False):
+        return hyutil.analyze_chart(
+            self.chartfolder + os.sep + chartname,
+            'expert', True, True,
+            'scores', 5,
+            ms_filter,
+            ms_frontier=ms_frontier
+        )
+    
+    def _test_frontier(self, chartname):
+        frontier_record = self._analyze(chartname, None, ms_frontier=True)
+        
+        for i, ms_filter in enumerate(range(-200, 205, 50)):
+            with self.subTest(i=i):
+                filter_record = self._analyze(chartname, ms_filter)
+                view = list(frontier_record.view_paths(ms_filter))
+                
+                # Same optimal paths
+                best_score = filter_record.best_path().totalscore()
+                self.assertEqual(view[0].totalscore(), best_score)
+                
+                # Same best path within the limit
+                def best_passing(paths):
+                    return max((p.totalscore() for p in paths if p.passes_ms_filter(ms_filter)), default=None)
+                self.assertEqual(best_passing(view), best_passing(filter_record.all_paths()))
+                
+                # Nothing from the filter record is missing from the view
+                view_pathstrs = set(p.pathstring() for p in view)
+                for p in filter_record.all_paths():
+                    self.assertIn(p.pathstring(), view_pathstrs)
+    
+    def test_frontier_senescence(self):
+        self._test_frontier("senescence.chart")
+    
+    def test_frontier_allies(self):
+        self._test_frontier("allies.chart")
+        
+    def test_frontier_focus(self):
+        self._test_frontier("focus.mid")
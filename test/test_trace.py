@@ -0,0 +1,49 @@
+import os
+import unittest
+import json
+
+import hydra.hyutil as hyutil
+
+
+class TestTrace(unittest.TestCase):
+    """Tests for the search trace that analysis can return."""
+    def setUp(self):
+        self.chartfolder = os.sep.join(["..","test","input","test_sb25"])
+
+    def _analyze(self, chartname, **kwargs):
+        return hyutil.analyze_chart(
+            self.chartfolder + os.sep + chartname,
+            'expert', True, True,
+            'scores', 2,
+            **kwargs
+        )
+
+    def test_trace(self):
+        record, trace = self._analyze("allies.chart", ms_filter=0, trace=True)
+        self.assertEqual(record.best_path().totalscore(), self._analyze("allies.chart", ms_filter=0).best_path().totalscore())
+
+        self.assertGreater(trace.node_count, 0)
+        self.assertGreater(trace.edge_count, trace.node_count // 2)
+        self.assertGreater(len(trace.steps), 0)
+        self.assertEqual(trace.steps[-1]['paths_out'], sum(1 for p in record.all_paths() if not p.is_variant()))
+
+        for step in trace.steps:
+            self.assertEqual(
+                step['paths_in'] - step['dominated'] - step['filtered'] - step['variants'] - step['beamed'],
+                step['paths_out']
+            )
+
+        self.assertGreater(trace.total('dominated'), 0)
+        self.assertEqual(trace.peak_paths(), max(step['paths_in'] for step in trace.steps))
+
+        json.dumps(trace.to_dict())
+
+    def test_trace_beamed(self):
+        record, trace = self._analyze("allies.chart", frontier_budget=0, beam_width=1, trace=True)
+        self.assertTrue(record.is_approximate())
+        self.assertGreater(trace.total('beamed'), 0)
+
+    def test_trace_tempomap(self):
+        record, tempo_map, trace = self._analyze("allies.chart", export_tempomap=True, trace=True)
+        self.assertIn('bpm', tempo_map)
+        self.assertIsNotNone(trace.parse_seconds)
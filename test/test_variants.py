@@ -0,0 +1,64 @@
+import unittest
+
+import hydra.hydata as hydata
+
+
+class TestVariants(unittest.TestCase):
+    """Tests for variants reading activations from the paths they converge with."""
+    def _path(self, activations):
+        p = hydata.Path()
+        p._activations = activations
+        return p
+
+    def test_nested_variants(self):
+        acts = [hydata.Activation() for i in range(6)]
+
+        # Base path: 0 1 2 3 4 5
+        # Variant a converges after 2 activations of the base path
+        # Variant b converges after 1 activation of variant a
+        base = self._path(acts)
+        base.score_base = 1000
+        a = self._path([acts[2]])
+        a.var_point = 2
+        b = self._path([acts[3], acts[4]])
+        b.var_point = 1
+        a.variants.append(b)
+        base.variants.append(a)
+
+        record = hydata.HydraRecord()
+        record._paths = [base]
+        base.prepare_variants()
+
+        paths = list(record.all_paths())
+        self.assertEqual(len(paths), 3)
+        self.assertIs(paths[0], base)
+
+        a, b = paths[1], paths[2]
+        self.assertEqual(list(a.all_activations()), [acts[2]] + acts[2:])
+        self.assertEqual(list(b.all_activations()), [acts[3], acts[4]] + acts[2:])
+        self.assertEqual(len(b), 6)
+        self.assertEqual(b.totalscore(), 1000)
+
+        for i in range(-len(b), len(b)):
+            self.assertIs(b.get_activation(i), list(b.all_activations())[i])
+        with self.assertRaises(IndexError):
+            b.get_activation(len(b))
+
+    def test_traversal_order(self):
+        # Preorder: each path, then its variants and their variants
+        paths = [self._path([]) for i in range(6)]
+        paths[0].variants = [paths[1], paths[3]]
+        paths[1].variants = [paths[2]]
+        paths[4].variants = [paths[5]]
+        for i in [1, 2, 3, 5]:
+            paths[i].var_point = 0
+
+        record = hydata.HydraRecord()
+        record._paths = [paths[0], paths[4]]
+        for p in record._paths:
+            p.prepare_variants()
+
+        self.assertEqual(
+            [len(p.variants) for p in record.all_paths()],
+            [2, 1, 0, 0, 1, 0]
+        )
@@ -0,0 +1,31 @@
+import os
+import unittest
+from unittest import mock
+
+import hydra.hyutil as hyutil
+import hydra.hypath as hypath
+
+
+class TestWorkers(unittest.TestCase):
+    """Analysis split across worker processes should find the same paths as
+    analysis done in one process."""
+    def setUp(self):
+        self.chartfolder = os.sep.join(["..","test","input","test_sb25"])
+
+    def _analyze(self, chartname, workers):
+        return hyutil.analyze_chart(
+            self.chartfolder + os.sep + chartname,
+            'expert', True, True,
+            'scores', 4,
+            workers=workers
+        )
+
+    def test_workers_allies(self):
+        record = self._analyze("allies.chart", None)
+        with mock.patch.object(hypath, 'PARALLEL_MIN_PATHS', 2):
+            parallel_record = self._analyze("allies.chart", 2)
+
+        self.assertEqual(
+            [(p.totalscore(), p.pathstring()) for p in parallel_record.all_paths()],
+            [(p.totalscore(), p.pathstring()) for p in record.all_paths()]
+        )